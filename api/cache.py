@@ -0,0 +1,77 @@
+"""
+Response cache module for Maestro Builder API
+In-process LRU cache for LLM backend responses, keyed on a hash of the inputs
+"""
+
+import hashlib
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Optional
+
+
+def cache_key(*parts: str) -> str:
+    """Hash the request inputs into a fixed-size cache key"""
+    digest = hashlib.blake2b(digest_size=16)
+    for part in parts:
+        digest.update(part.encode("utf-8"))
+        # Separator so ("ab", "c") and ("a", "bc") hash differently
+        digest.update(b"\0")
+    return digest.hexdigest()
+
+
+class ResponseCache:
+    """
+    Thread-safe LRU cache for backend responses, with optional per-entry TTL.
+
+    Set MAESTRO_BUILDER_CACHE=0 to disable caching globally.
+    """
+
+    def __init__(
+        self,
+        maxsize: int = 256,
+        enabled: Optional[bool] = None,
+        ttl: Optional[float] = None,
+    ):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        if enabled is None:
+            enabled = os.getenv("MAESTRO_BUILDER_CACHE", "1") != "0"
+        self.enabled = enabled
+        self._entries: "OrderedDict[str, Any]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[Any]:
+        """Return the cached value for key, or None on a miss"""
+        if not self.enabled:
+            return None
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            expires_at, value = entry
+            if expires_at is not None and time.monotonic() >= expires_at:
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key: str, value: Any):
+        """Store a value, evicting the least recently used entry when full"""
+        if not self.enabled:
+            return
+        expires_at = time.monotonic() + self.ttl if self.ttl is not None else None
+        with self._lock:
+            self._entries[key] = (expires_at, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        """Drop all cached entries"""
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self) -> int:
+        return len(self._entries)
@@ -0,0 +1,82 @@
+"""
+Circuit breaker module for Maestro Builder API
+Fails fast on calls to a backend service that keeps erroring, instead of
+waiting out the full request timeout on every call
+"""
+
+import threading
+import time
+from typing import Dict
+from urllib.parse import urlsplit
+
+
+class CircuitOpenError(Exception):
+    """Raised when a call is rejected because the backend's circuit is open"""
+
+
+class CircuitBreaker:
+    """
+    Consecutive-failure circuit breaker.
+
+    After fail_max failures in a row the circuit opens and calls are rejected
+    for reset_timeout seconds. The next call after that is let through as a
+    trial: success closes the circuit, failure opens it again.
+    """
+
+    def __init__(self, name: str, fail_max: int = 5, reset_timeout: float = 30.0):
+        self.name = name
+        self.fail_max = fail_max
+        self.reset_timeout = reset_timeout
+        self._failures = 0
+        self._opened_at = None
+        self._lock = threading.Lock()
+
+    @property
+    def is_open(self) -> bool:
+        with self._lock:
+            return self._opened_at is not None
+
+    def before_call(self):
+        """Raise CircuitOpenError if calls to the backend are currently rejected"""
+        with self._lock:
+            if self._opened_at is None:
+                return
+            if time.monotonic() - self._opened_at < self.reset_timeout:
+                raise CircuitOpenError(
+                    f"{self.name} is unavailable after repeated failures; "
+                    f"retrying in up to {self.reset_timeout:.0f}s"
+                )
+            # Half-open: let this call through as the trial and push the
+            # window forward so concurrent callers keep failing fast
+            self._opened_at = time.monotonic()
+
+    def record_success(self):
+        with self._lock:
+            self._failures = 0
+            self._opened_at = None
+
+    def record_failure(self):
+        with self._lock:
+            self._failures += 1
+            if self._failures >= self.fail_max:
+                self._opened_at = time.monotonic()
+
+
+_breakers: Dict[str, CircuitBreaker] = {}
+_breakers_lock = threading.Lock()
+
+
+def get_breaker(url: str) -> CircuitBreaker:
+    """Return the shared breaker for the backend serving url (one per host:port)"""
+    netloc = urlsplit(url).netloc
+    with _breakers_lock:
+        breaker = _breakers.get(netloc)
+        if breaker is None:
+            breaker = _breakers[netloc] = CircuitBreaker(netloc)
+        return breaker
+
+
+def reset_breakers():
+    """Forget all breaker state"""
+    with _breakers_lock:
+        _breakers.clear()
@@ -4,6 +4,9 @@ Handles SQLite operations for chat sessions and YAML files
 """
 
 import sqlite3
+import threading
+import time
+from contextlib import contextmanager
 from datetime import datetime
 from pathlib import Path
 from typing import Dict, List, Optional, Any
@@ -14,11 +17,28 @@ class Database:
     def __init__(self, db_path: str = "storage/maestro_builder.db"):
         self.db_path = Path(db_path)
         self.db_path.parent.mkdir(exist_ok=True)
+        # One long-lived connection shared by the event loop and worker threads;
+        # SQLite serializes writes anyway, so a lock is cheaper than reconnecting
+        self._conn = sqlite3.connect(self.db_path, check_same_thread=False)
+        self._lock = threading.RLock()
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
         self.init_database()
 
+    @contextmanager
+    def _connection(self):
+        """Yield the shared connection, committing on success and rolling back on error"""
+        with self._lock, self._conn:
+            yield self._conn
+
+    def close(self):
+        """Close the shared connection"""
+        with self._lock:
+            self._conn.close()
+
     def init_database(self):
         """Initialize the database with required tables"""
-        with sqlite3.connect(self.db_path) as conn:
+        with self._connection() as conn:
             cursor = conn.cursor()
 
             # Create chat_sessions table
@@ -56,6 +76,15 @@ class Database:
                 )
             """)
 
+            # Create prompt_cache table (generated agents YAML keyed by prompt hash)
+            cursor.execute("""
+                CREATE TABLE IF NOT EXISTS prompt_cache (
+                    prompt_hash TEXT PRIMARY KEY,
+                    yaml TEXT NOT NULL,
+                    created_at REAL NOT NULL
+                )
+            """)
+
             # Create indexes for better performance
             cursor.execute(
                 "CREATE INDEX IF NOT EXISTS idx_messages_chat_id ON messages (chat_id)"
@@ -79,7 +108,7 @@ class Database:
         if not name:
             name = f"Chat {datetime.now().strftime('%Y-%m-%d %H:%M')}"
 
-        with sqlite3.connect(self.db_path) as conn:
+        with self._connection() as conn:
             cursor = conn.cursor()
             cursor.execute(
                 """
@@ -94,7 +123,7 @@ class Database:
 
     def get_chat_session(self, chat_id: str) -> Optional[Dict[str, Any]]:
         """Get a chat session by ID"""
-        with sqlite3.connect(self.db_path) as conn:
+        with self._connection() as conn:
             cursor = conn.cursor()
             cursor.execute(
                 """
@@ -118,7 +147,7 @@ class Database:
 
     def get_all_chat_sessions(self) -> List[Dict[str, Any]]:
         """Get all chat sessions"""
-        with sqlite3.connect(self.db_path) as conn:
+        with self._connection() as conn:
             cursor = conn.cursor()
             cursor.execute("""
                 SELECT id, name, created_at, updated_at, message_count
@@ -141,7 +170,7 @@ class Database:
 
     def add_message(self, chat_id: str, role: str, content: str) -> int:
         """Add a message to a chat session"""
-        with sqlite3.connect(self.db_path) as conn:
+        with self._connection() as conn:
             cursor = conn.cursor()
             cursor.execute(
                 """
@@ -168,7 +197,7 @@ class Database:
         self, chat_id: str, limit: Optional[int] = None
     ) -> List[Dict[str, Any]]:
         """Get messages for a chat session"""
-        with sqlite3.connect(self.db_path) as conn:
+        with self._connection() as conn:
             cursor = conn.cursor()
 
             query = """
@@ -195,9 +224,28 @@ class Database:
                 )
             return messages
 
+    def get_last_messages(self) -> Dict[str, str]:
+        """Get the most recent message content for every chat session"""
+        with self._connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute("""
+                SELECT chat_id, content
+                FROM (
+                    SELECT chat_id, content,
+                           ROW_NUMBER() OVER (
+                               PARTITION BY chat_id
+                               ORDER BY timestamp DESC, id DESC
+                           ) AS rn
+                    FROM messages
+                )
+                WHERE rn = 1
+            """)
+
+            return {row[0]: row[1] for row in cursor.fetchall()}
+
     def update_yaml_files(self, chat_id: str, yaml_files: Dict[str, str]):
         """Update YAML files for a chat session"""
-        with sqlite3.connect(self.db_path) as conn:
+        with self._connection() as conn:
             cursor = conn.cursor()
 
             for file_name, content in yaml_files.items():
@@ -213,7 +261,7 @@ class Database:
 
     def get_yaml_files(self, chat_id: str) -> Dict[str, str]:
         """Get YAML files for a chat session"""
-        with sqlite3.connect(self.db_path) as conn:
+        with self._connection() as conn:
             cursor = conn.cursor()
             cursor.execute(
                 """
@@ -230,9 +278,45 @@ class Database:
 
             return yaml_files
 
+    def get_cached_agents_yaml(
+        self, prompt_hash: str, max_age_seconds: float
+    ) -> Optional[str]:
+        """Get cached agents YAML for a prompt hash if it is newer than max_age_seconds"""
+        with self._connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute(
+                """
+                SELECT yaml FROM prompt_cache
+                WHERE prompt_hash = ? AND created_at >= ?
+            """,
+                (prompt_hash, time.time() - max_age_seconds),
+            )
+            row = cursor.fetchone()
+            return row[0] if row else None
+
+    def set_cached_agents_yaml(
+        self, prompt_hash: str, yaml_content: str, max_age_seconds: Optional[float] = None
+    ):
+        """Store generated agents YAML for a prompt hash, pruning rows older than max_age_seconds"""
+        with self._connection() as conn:
+            cursor = conn.cursor()
+            if max_age_seconds is not None:
+                cursor.execute(
+                    "DELETE FROM prompt_cache WHERE created_at < ?",
+                    (time.time() - max_age_seconds,),
+                )
+            cursor.execute(
+                """
+                INSERT OR REPLACE INTO prompt_cache (prompt_hash, yaml, created_at)
+                VALUES (?, ?, ?)
+            """,
+                (prompt_hash, yaml_content, time.time()),
+            )
+            conn.commit()
+
     def delete_chat_session(self, chat_id: str) -> bool:
         """Delete a chat session and all associated data"""
-        with sqlite3.connect(self.db_path) as conn:
+        with self._connection() as conn:
             cursor = conn.cursor()
             cursor.execute("DELETE FROM chat_sessions WHERE id = ?", (chat_id,))
             conn.commit()
@@ -240,7 +324,7 @@ class Database:
 
     def delete_all_chat_sessions(self) -> bool:
         """Delete all chat sessions and all associated data"""
-        with sqlite3.connect(self.db_path) as conn:
+        with self._connection() as conn:
             cursor = conn.cursor()
             cursor.execute("DELETE FROM chat_sessions")
             conn.commit()
@@ -248,7 +332,7 @@ class Database:
 
     def get_chat_summary(self, chat_id: str) -> Optional[Dict[str, Any]]:
         """Get a summary of a chat session including last message"""
-        with sqlite3.connect(self.db_path) as conn:
+        with self._connection() as conn:
             cursor = conn.cursor()
             cursor.execute(
                 """
@@ -3,32 +3,108 @@ Maestro Builder API
 A FastAPI application to support the Maestro Builder frontend application.
 """
 
-from fastapi import FastAPI, HTTPException
+from fastapi import FastAPI, HTTPException, Request, Response, WebSocket, WebSocketDisconnect
 from fastapi.responses import StreamingResponse
 from fastapi.middleware.cors import CORSMiddleware
 from pydantic import BaseModel
 from typing import List, Dict, Any, Optional
-from datetime import datetime
+from datetime import datetime, timezone
 from api.ai_agent import MaestroBuilderAgent
 from api.database import Database
-from api.supervisor import SupervisorAgent, Intent
+from api.supervisor import (
+    SupervisorAgent,
+    Intent,
+    MAX_YAML_SCAN_CHARS,
+    AGENTS_YAML_CACHE_TTL,
+    load_persisted_agents_yaml,
+    persist_agents_yaml,
+)
+from api.cache import ResponseCache, cache_key
+from api.circuit_breaker import get_breaker
 import uuid
-import subprocess
 import tempfile
 import os
 import yaml
 import re
-import json
 import asyncio
+import logging
+import threading
 from pathlib import Path
 import httpx
-from concurrent.futures import ThreadPoolExecutor
+import orjson
+from functools import lru_cache
+from contextlib import asynccontextmanager
+
+try:
+    # Lets log tailing sleep until the file changes
+    from watchfiles import awatch
+except ImportError:
+    awatch = None
+
+logger = logging.getLogger(__name__)
+
+# Prefer the libyaml C loader; fall back to the pure-Python one when PyYAML
+# was built without it.
+YAML_LOADER = getattr(yaml, "CSafeLoader", yaml.SafeLoader)
+
+# Paths resolved once at import
+PROJECT_ROOT = Path(__file__).resolve().parent.parent
+LOGS_DIR = PROJECT_ROOT / "logs"
+LOG_FILE_MAP = {
+    "agents": LOGS_DIR / "maestro_agents.log",
+    "workflow": LOGS_DIR / "maestro_workflow.log",
+}
+
+_ANSI_ESCAPE_RE = re.compile(r'\x1B(?:[@-Z\\-_]|\[[0-?]*[ -/]*[@-~])')
+
+# Patterns used to pull YAML out of model responses, compiled once
+_YAML_FENCE_RE = re.compile(r"```yaml(.*?)(?:```|\Z)", re.DOTALL)
+_FENCE_RE = re.compile(r"```(.*?)(?:```|\Z)", re.DOTALL)
+_API_VERSION_RE = re.compile(r"apiVersion:.*?(?=\n\n|\Z)", re.DOTALL)
+_NAME_RE = re.compile(r"name:\s*(\w+)")
+_DESC_RE = re.compile(r"description:\s*\|\s*\n\s*(.+?)(?=\n\s*\w+:|$)", re.DOTALL)
+
+# Stand-in agents for /api/chat_builder_workflow, pre-parsed so the
+# placeholder never goes through the YAML loader
+SIMPLE_AGENTS_YAML = """apiVersion: v1
+kind: Agent
+metadata:
+  name: placeholder
+spec:
+  description: Placeholder agent for workflow generation
+---
+"""
+SIMPLE_AGENTS_INFO = [
+    {"name": "placeholder", "description": "Placeholder agent for workflow generation"}
+]
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Hold one pooled HTTP client for calls to the Maestro agent backends,
+    and close the shared database connection on shutdown."""
+    app.state.http = httpx.AsyncClient(
+        timeout=180,
+        # Backend calls are minutes apart during a session; keep idle
+        # connections around longer than httpx's 5s default
+        limits=httpx.Limits(
+            max_connections=100, max_keepalive_connections=20, keepalive_expiry=60
+        ),
+    )
+    supervisor_agent.http_client = app.state.http
+    yield
+    supervisor_agent.http_client = None
+    await app.state.http.aclose()
+    # Checkpoint the WAL and release the shared connection on shutdown
+    db.close()
+
 
 # Initialize FastAPI app
 app = FastAPI(
     title="Maestro Builder API",
     description="API for the Maestro Builder application",
     version="1.0.0",
+    lifespan=lifespan,
 )
 
 # CORS settings for frontend dev
@@ -110,6 +186,17 @@ class ValidateYamlResponse(BaseModel):
 status_updates = {}
 last_sent_index = {}
 request_results = {} 
+# Per-request event queues for /ws/supervisor/{request_id}; created when an
+# async request starts so events emitted before the socket connects are kept
+supervisor_streams: Dict[str, asyncio.Queue] = {}
+# How long a finished request's stream waits for a subscriber before it is dropped
+SUPERVISOR_STREAM_GRACE_SECONDS = 60
+
+def _push_stream_event(request_id: str, event: Dict[str, Any]):
+    """Queue an event for the request's WebSocket subscriber, if it has a stream."""
+    queue = supervisor_streams.get(request_id)
+    if queue is not None:
+        queue.put_nowait(event)
 
 def create_status_logger(chat_id: str):
     """Create a logger function that tracks status updates for the frontend."""
@@ -122,89 +209,172 @@ def create_status_logger(chat_id: str):
             "timestamp": datetime.now().isoformat()
         }
         status_updates[chat_id].append(update)
+        _push_stream_event(chat_id, {"type": "status", **update})
     return log_status
 
 supervisor_agent = SupervisorAgent()
-executor = ThreadPoolExecutor(max_workers=4)
+background_tasks = set()
+
+# Random bytes for request/chat IDs, refilled with one os.urandom call per
+# 256 IDs instead of one call per uuid.uuid4()
+_ID_POOL_SIZE = 16 * 256
+_id_pool = b""
+_id_pos = _ID_POOL_SIZE
+_id_lock = threading.Lock()
+
+
+def new_id() -> str:
+    """Return a random UUID4 string drawn from a buffered entropy pool."""
+    global _id_pool, _id_pos
+    with _id_lock:
+        if _id_pos >= _ID_POOL_SIZE:
+            _id_pool = os.urandom(_ID_POOL_SIZE)
+            _id_pos = 0
+        raw = _id_pool[_id_pos:_id_pos + 16]
+        _id_pos += 16
+    return str(uuid.UUID(bytes=raw, version=4))
+
+
+# Same expiry as the supervisor's agents YAML cache, which shares the prompt_cache table
+agents_response_cache = ResponseCache(maxsize=256, ttl=AGENTS_YAML_CACHE_TTL)
+
+# Limits for calls to the Maestro agent backends
+MAX_BACKEND_CONCURRENCY = 8
+BACKEND_RETRY_ATTEMPTS = 3
+BACKEND_RETRY_BASE_DELAY = 0.5
+BACKEND_RETRY_MAX_DELAY = 4.0
+backend_semaphore = asyncio.Semaphore(MAX_BACKEND_CONCURRENCY)
 
 # ---------------------------------------
 # Service Functions
 # ---------------------------------------
+async def post_to_backend(url: str, payload: Dict[str, Any], timeout: float) -> httpx.Response:
+    """POST to a Maestro backend, retrying 429/5xx responses with exponential backoff.
+
+    Raises CircuitOpenError without calling the backend once it has failed
+    repeatedly, so callers fail fast instead of waiting out the timeout.
+    """
+    breaker = get_breaker(url)
+    for attempt in range(BACKEND_RETRY_ATTEMPTS):
+        breaker.before_call()
+        try:
+            async with backend_semaphore:
+                resp = await app.state.http.post(url, json=payload, timeout=timeout)
+        except httpx.HTTPError:
+            breaker.record_failure()
+            raise
+        if resp.status_code >= 500:
+            breaker.record_failure()
+        else:
+            breaker.record_success()
+        retryable = resp.status_code == 429 or resp.status_code >= 500
+        if not retryable or attempt == BACKEND_RETRY_ATTEMPTS - 1:
+            return resp
+        await asyncio.sleep(min(BACKEND_RETRY_MAX_DELAY, BACKEND_RETRY_BASE_DELAY * 2 ** attempt))
+
+
+@lru_cache(maxsize=256)
+def _parse_agents_info(agents_yaml: str) -> tuple[tuple[str, str], ...]:
+    """Extract (name, description) pairs from agents YAML.
+
+    Cached on the raw YAML text: retried prompts frequently produce identical
+    agents.yaml, so repeat calls skip the YAML parse entirely.
+    """
+    agents_info: List[tuple[str, str]] = []
+    try:
+        # One pass over the multi-document stream instead of split('---')
+        # followed by a separate parse per block.
+        for agent_data in yaml.load_all(agents_yaml, Loader=YAML_LOADER):
+            if isinstance(agent_data, dict) and 'metadata' in agent_data and 'name' in agent_data['metadata']:
+                name = agent_data['metadata']['name']
+                description = agent_data.get('spec', {}).get('description', '')
+                agents_info.append((name, description))
+    except yaml.YAMLError:
+        name_matches = _NAME_RE.findall(agents_yaml)
+        desc_matches = _DESC_RE.findall(agents_yaml)
+        for i, name in enumerate(name_matches):
+            description = desc_matches[i] if i < len(desc_matches) else ""
+            agents_info.append((name, description.strip()))
+    return tuple(agents_info)
+
+
+def _extract_yaml_from_model_output(output: str) -> str:
+    """Return the YAML block from a model response, or "" if none is found."""
+    fence_match = _YAML_FENCE_RE.search(output) or _FENCE_RE.search(output)
+    if fence_match:
+        return fence_match.group(1).strip()
+    yaml_match = _API_VERSION_RE.search(output[:MAX_YAML_SCAN_CHARS])
+    return yaml_match.group(0).strip() if yaml_match else ""
+
+
 async def generate_agents_yaml(prompt: str) -> tuple[str, str]:
     """Generate agents.yaml content from user prompt."""
-    async with httpx.AsyncClient(timeout=120) as client:
-        agents_resp = await client.post(
-            "http://localhost:8003/chat",
-            json={"prompt": prompt, "agent": "TaskInterpreter"},
-        )
+    key = cache_key(prompt)
+    cached = agents_response_cache.get(key)
+    if cached is not None:
+        return cached
+    # Only the YAML is persisted, so it stands in for the raw model output
+    persisted = await load_persisted_agents_yaml(db, key)
+    if persisted is not None:
+        agents_response_cache.set(key, (persisted, persisted))
+        return persisted, persisted
+
+    agents_resp = await post_to_backend(
+        "http://localhost:8003/chat",
+        {"prompt": prompt, "agent": "TaskInterpreter"},
+        timeout=120,
+    )
     
     if agents_resp.status_code != 200:
         raise Exception(f"Agents generation failed: {agents_resp.text}")
 
-    agents_output = agents_resp.json().get("response", "")
-    agents_yaml = ""
-    
-    if "```yaml" in agents_output:
-        agents_yaml = (
-            agents_output.split("```yaml", 1)[-1].split("```", 1)[0].strip()
-        )
-    elif "```" in agents_output:
-        agents_yaml = agents_output.split("```", 1)[-1].split("```", 1)[0].strip()
-    else:
-        yaml_match = re.search(r"apiVersion:.*?(?=\n\n|\Z)", agents_output, re.DOTALL)
-        if yaml_match:
-            agents_yaml = yaml_match.group(0).strip()
+    agents_output = orjson.loads(agents_resp.content).get("response", "")
+    agents_yaml = _extract_yaml_from_model_output(agents_output)
+
+    if agents_yaml:
+        agents_response_cache.set(key, (agents_output, agents_yaml))
+        await persist_agents_yaml(db, key, agents_yaml)
     
     return agents_output, agents_yaml
 
 
-async def generate_workflow_yaml(agents_yaml: str, user_prompt: str) -> tuple[str, str]:
-    """Generate workflow.yaml content based on agents and user prompt."""
-    # Parse agents to build workflow prompt
-    agents_info: List[Dict[str, str]] = []
-    try:
-        agent_blocks = agents_yaml.split('---')
-        for block in agent_blocks:
-            if block.strip():
-                agent_data = yaml.safe_load(block)
-                if agent_data and 'metadata' in agent_data and 'name' in agent_data['metadata']:
-                    name = agent_data['metadata']['name']
-                    description = agent_data.get('spec', {}).get('description', '')
-                    agents_info.append({'name': name, 'description': description})
-    except yaml.YAMLError:
-        name_matches = re.findall(r'name:\s*(\w+)', agents_yaml)
-        desc_matches = re.findall(r'description:\s*\|\s*\n\s*(.+?)(?=\n\s*\w+:|$)', agents_yaml, re.DOTALL)
-        for i, name in enumerate(name_matches):
-            description = desc_matches[i] if i < len(desc_matches) else ""
-            agents_info.append({'name': name, 'description': description.strip()})
-
-    workflow_prompt = f"Create a workflow that uses the following agents:\n\n"
+def _build_workflow_prompt(agents_info: List[Dict[str, str]], user_prompt: str) -> str:
+    """Build the workflow generation prompt from parsed agents and the user prompt."""
+    workflow_prompt = "Create a workflow that uses the following agents:\n\n"
     for i, agent in enumerate(agents_info, 1):
         workflow_prompt += f"agent{i}: {agent['name']} – {agent['description']}\n"
     workflow_prompt += f"\nprompt: {user_prompt}"
+    return workflow_prompt
 
-    async with httpx.AsyncClient(timeout=180) as client:
-        workflow_resp = await client.post(
-            "http://localhost:8004/chat",
-            json={"prompt": workflow_prompt, "agent": "WorkflowYAMLBuilder"},
-        )
+
+async def generate_workflow_yaml(
+    agents_yaml: str,
+    user_prompt: str,
+    agents_info: Optional[List[Dict[str, str]]] = None,
+) -> tuple[str, str]:
+    """Generate workflow.yaml content based on agents and user prompt.
+
+    Pass agents_info to skip parsing agents_yaml when it is already known.
+    Returns the raw model output alongside the extracted YAML.
+    """
+    if agents_info is None:
+        agents_info = [
+            {'name': name, 'description': description}
+            for name, description in _parse_agents_info(agents_yaml)
+        ]
+    workflow_prompt = _build_workflow_prompt(agents_info, user_prompt)
+
+    workflow_resp = await post_to_backend(
+        "http://localhost:8004/chat",
+        {"prompt": workflow_prompt, "agent": "WorkflowYAMLBuilder"},
+        timeout=180,
+    )
     
     if workflow_resp.status_code != 200:
         raise Exception(f"Workflow generation failed: {workflow_resp.text}")
 
-    workflow_output = workflow_resp.json().get("response", "")
-    workflow_yaml = ""
-    
-    if "```yaml" in workflow_output:
-        workflow_yaml = (
-            workflow_output.split("```yaml", 1)[-1].split("```", 1)[0].strip()
-        )
-    elif "```" in workflow_output:
-        workflow_yaml = workflow_output.split("```", 1)[-1].split("```", 1)[0].strip()
-    else:
-        yaml_match = re.search(r"apiVersion:.*?(?=\n\n|\Z)", workflow_output, re.DOTALL)
-        if yaml_match:
-            workflow_yaml = yaml_match.group(0).strip()
+    workflow_output = orjson.loads(workflow_resp.content).get("response", "")
+    workflow_yaml = _extract_yaml_from_model_output(workflow_output)
     
     return workflow_output, workflow_yaml
 
@@ -222,8 +392,48 @@ I've created:
 Both files are now available in the YAML panel on the right. You can switch between tabs to view each file."""
 
 
+async def edit_existing_yaml(message: ChatMessage) -> Optional[tuple[str, List[Dict[str, str]], str]]:
+    """Apply the message as an edit when the chat already has YAML and the
+    supervisor classifies it as EDIT_YAML; returns None otherwise."""
+    if not message.chat_id:
+        return None
+    existing = await asyncio.to_thread(db.get_yaml_files, message.chat_id)
+    agents_yaml = existing.get("agents.yaml", "")
+    workflow_yaml = existing.get("workflow.yaml", "")
+    # Nothing to edit, so skip the classification round-trip entirely
+    if not agents_yaml and not workflow_yaml:
+        return None
+
+    try:
+        classification = await supervisor_agent.classify_user_intent(
+            message.content, agents_yaml, workflow_yaml
+        )
+    except Exception as e:
+        # A classifier outage (or open circuit) falls back to normal generation
+        logger.warning("Intent classification failed, generating instead: %s", e)
+        return None
+    if classification.intent != Intent.EDIT_YAML:
+        return None
+
+    file_to_edit = "agents.yaml" if agents_yaml else "workflow.yaml"
+    edited_yaml = await supervisor_agent.edit_yaml(
+        yaml_content=agents_yaml or workflow_yaml,
+        file_to_edit=file_to_edit,
+        instruction=message.content,
+    )
+    response_text = supervisor_agent.build_success_response(
+        Intent.EDIT_YAML, message.content, file_to_edit
+    )
+    return response_text, [{"name": file_to_edit, "content": edited_yaml}], message.chat_id
+
+
 async def generate_complete_workflow(message: ChatMessage) -> tuple[str, List[Dict[str, str]], str]:
     """Main function to generate both agents and workflow YAMLs."""
+    # Edits of an existing chat's YAML skip both generation calls
+    edited = await edit_existing_yaml(message)
+    if edited is not None:
+        return edited
+
     agents_output, agents_yaml = await generate_agents_yaml(message.content)
     workflow_output, workflow_yaml = await generate_workflow_yaml(agents_yaml, message.content)
     final_response = create_final_response(message.content, agents_yaml, workflow_yaml)
@@ -231,7 +441,7 @@ async def generate_complete_workflow(message: ChatMessage) -> tuple[str, List[Di
         {"name": "agents.yaml", "content": agents_yaml},
         {"name": "workflow.yaml", "content": workflow_yaml},
     ]
-    return final_response, yaml_files, str(uuid.uuid4())
+    return final_response, yaml_files, new_id()
 
 
 # ---------------------------------------
@@ -251,7 +461,7 @@ async def chat_builder_agent(message: ChatMessage):
         return {
             "response": agents_output,
             "yaml_files": [{"name": "agents.yaml", "content": agents_yaml}],
-            "chat_id": str(uuid.uuid4()),
+            "chat_id": new_id(),
         }
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Builder Agent failed: {e}")
@@ -260,19 +470,13 @@ async def chat_builder_agent(message: ChatMessage):
 @app.post("/api/chat_builder_workflow", response_model=ChatResponse)
 async def chat_builder_workflow(message: ChatMessage):
     try:
-        simple_agents_yaml = """apiVersion: v1
-kind: Agent
-metadata:
-  name: placeholder
-spec:
-  description: Placeholder agent for workflow generation
----
-"""
-        workflow_output, workflow_yaml = await generate_workflow_yaml(simple_agents_yaml, message.content)
+        workflow_output, workflow_yaml = await generate_workflow_yaml(
+            SIMPLE_AGENTS_YAML, message.content, agents_info=SIMPLE_AGENTS_INFO
+        )
         return {
             "response": workflow_output,
             "yaml_files": [{"name": "workflow.yaml", "content": workflow_yaml}],
-            "chat_id": str(uuid.uuid4()),
+            "chat_id": new_id(),
         }
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Workflow Builder failed: {e}")
@@ -295,6 +499,49 @@ async def generate(message: ChatMessage):
         raise HTTPException(status_code=500, detail=f"Complete Builder failed: {e}")
 
 
+def _to_ndjson_line(obj: Dict[str, Any]) -> bytes:
+    """Encode one event for the NDJSON stream."""
+    return orjson.dumps(obj) + b"\n"
+
+
+def _to_sse_event(obj: Dict[str, Any]) -> bytes:
+    """Encode one Server-Sent Events data frame."""
+    return b"data: " + orjson.dumps(obj) + b"\n\n"
+
+
+# The stream's fixed progress messages, encoded once at import
+STREAM_STATUS_LINES = {
+    message: _to_ndjson_line({"type": "status", "message": message})
+    for message in (
+        "(Starting generation)",
+        "(Reading user request)",
+        "(Planning agents)",
+        "Generating agents.yaml",
+        "(Parsing agents output)",
+        "(Building workflow prompt)",
+        "Generating workflow.yaml",
+        "(Parsing workflow output)",
+        "(Finalizing response)",
+    )
+}
+
+
+STREAM_CHUNK_BYTES = 16 * 1024
+
+
+def _ai_output_chunks(output: str, source: str):
+    """Yield the model output as ai_output NDJSON lines, batched into ~16 KB writes."""
+    buf = bytearray()
+    for line in output.splitlines():
+        if line.strip():
+            buf += _to_ndjson_line({"type": "ai_output", "source": source, "line": line})
+            if len(buf) >= STREAM_CHUNK_BYTES:
+                yield bytes(buf)
+                buf.clear()
+    if buf:
+        yield bytes(buf)
+
+
 @app.post("/api/generate/stream")
 async def generate_stream(message: ChatMessage):
     """
@@ -312,103 +559,48 @@ async def generate_stream(message: ChatMessage):
     """
 
     async def event_generator():
-        def to_line(obj: Dict[str, Any]) -> bytes:
-            return (json.dumps(obj, ensure_ascii=False) + "\n").encode("utf-8")
-
-        chat_id = str(uuid.uuid4())
+        chat_id = new_id()
+        workflow_task = None
         try:
             # Emit chat_id early so UI can attach updates
-            yield to_line({"type": "chat_id", "chat_id": chat_id})
-            yield to_line({"type": "status", "message": "(Starting generation)"})
-            await asyncio.sleep(0)
-            yield to_line({"type": "status", "message": "(Reading user request)"})
-            await asyncio.sleep(0)
-            yield to_line({"type": "status", "message": "(Planning agents)"})
-            await asyncio.sleep(0)
-            yield to_line({"type": "status", "message": "Generating agents.yaml"})
-            await asyncio.sleep(0)
+            yield _to_ndjson_line({"type": "chat_id", "chat_id": chat_id})
+            yield STREAM_STATUS_LINES["(Starting generation)"]
+            yield STREAM_STATUS_LINES["(Reading user request)"]
+            yield STREAM_STATUS_LINES["(Planning agents)"]
+            yield STREAM_STATUS_LINES["Generating agents.yaml"]
 
             agents_output, agents_yaml = await generate_agents_yaml(message.content)
-            for line in agents_output.splitlines():
-                if line.strip():
-                    yield to_line({"type": "ai_output", "source": "agents", "line": line})
-            await asyncio.sleep(0)
+            # The backend returns whole responses, so start the workflow call now
+            # and let it run while the agents events are written to the client
+            workflow_task = asyncio.create_task(
+                generate_workflow_yaml(agents_yaml, message.content)
+            )
+            for chunk in _ai_output_chunks(agents_output, "agents"):
+                yield chunk
 
             # Emit agents YAML as soon as it's ready
-            yield to_line({
+            yield _to_ndjson_line({
                 "type": "agents_yaml",
                 "file": {"name": "agents.yaml", "content": agents_yaml},
                 "chat_id": chat_id,
             })
-            await asyncio.sleep(0)
-            yield to_line({"type": "status", "message": "(Parsing agents output)"})
-            await asyncio.sleep(0)
-
-            # Build workflow prompt based on parsed agents
-            agents_info: List[Dict[str, str]] = []
-            try:
-                agent_blocks = agents_yaml.split('---')
-                for block in agent_blocks:
-                    if block.strip():
-                        agent_data = yaml.safe_load(block)
-                        if agent_data and 'metadata' in agent_data and 'name' in agent_data['metadata']:
-                            name = agent_data['metadata']['name']
-                            description = agent_data.get('spec', {}).get('description', '')
-                            agents_info.append({'name': name, 'description': description})
-            except yaml.YAMLError:
-                name_matches = re.findall(r'name:\s*(\w+)', agents_yaml)
-                desc_matches = re.findall(r'description:\s*\|\s*\n\s*(.+?)(?=\n\s*\w+:|$)', agents_yaml, re.DOTALL)
-                for i, name in enumerate(name_matches):
-                    description = desc_matches[i] if i < len(desc_matches) else ""
-                    agents_info.append({'name': name, 'description': description.strip()})
-
-            workflow_prompt = f"Create a workflow that uses the following agents:\n\n"
-            for i, agent in enumerate(agents_info, 1):
-                workflow_prompt += f"agent{i}: {agent['name']} – {agent['description']}\n"
-            workflow_prompt += f"\nprompt: {message.content}"
-
-            yield to_line({"type": "status", "message": "(Building workflow prompt)"})
-            await asyncio.sleep(0)
-            yield to_line({"type": "status", "message": "Generating workflow.yaml"})
-            await asyncio.sleep(0)
-
-            async with httpx.AsyncClient(timeout=180) as client:
-                workflow_resp = await client.post(
-                    "http://localhost:8004/chat",
-                    json={"prompt": workflow_prompt, "agent": "WorkflowYAMLBuilder"},
-                )
-            if workflow_resp.status_code != 200:
-                raise Exception(f"Workflow generation failed: {workflow_resp.text}")
+            yield STREAM_STATUS_LINES["(Parsing agents output)"]
+            yield STREAM_STATUS_LINES["(Building workflow prompt)"]
+            yield STREAM_STATUS_LINES["Generating workflow.yaml"]
 
-            workflow_output = workflow_resp.json().get("response", "")
-            workflow_yaml = ""
+            workflow_output, workflow_yaml = await workflow_task
             # Emit raw workflow output as AI output lines for UI visibility
-            for line in workflow_output.splitlines():
-                if line.strip():
-                    yield to_line({"type": "ai_output", "source": "workflow", "line": line})
-            await asyncio.sleep(0)
-            if "```yaml" in workflow_output:
-                workflow_yaml = (
-                    workflow_output.split("```yaml", 1)[-1].split("```", 1)[0].strip()
-                )
-            elif "```" in workflow_output:
-                workflow_yaml = workflow_output.split("```", 1)[-1].split("```", 1)[0].strip()
-            else:
-                yaml_match = re.search(r"apiVersion:.*?(?=\n\n|\Z)", workflow_output, re.DOTALL)
-                if yaml_match:
-                    workflow_yaml = yaml_match.group(0).strip()
+            for chunk in _ai_output_chunks(workflow_output, "workflow"):
+                yield chunk
 
             # Emit workflow YAML
-            yield to_line({
+            yield _to_ndjson_line({
                 "type": "workflow_yaml",
                 "file": {"name": "workflow.yaml", "content": workflow_yaml},
                 "chat_id": chat_id,
             })
-            await asyncio.sleep(0)
-            yield to_line({"type": "status", "message": "(Parsing workflow output)"})
-            await asyncio.sleep(0)
-            yield to_line({"type": "status", "message": "(Finalizing response)"})
-            await asyncio.sleep(0)
+            yield STREAM_STATUS_LINES["(Parsing workflow output)"]
+            yield STREAM_STATUS_LINES["(Finalizing response)"]
 
             final_response = create_final_response(message.content, agents_yaml, workflow_yaml)
 
@@ -421,15 +613,105 @@ async def generate_stream(message: ChatMessage):
                 ],
                 "chat_id": chat_id,
             }
-            yield to_line(final_payload)
-            yield to_line({"type": "done"})
+            yield _to_ndjson_line(final_payload)
+            yield _to_ndjson_line({"type": "done"})
         except Exception as e:
-            yield to_line({"type": "error", "message": f"{e}"})
-            yield to_line({"type": "done"})
+            yield _to_ndjson_line({"type": "error", "message": f"{e}"})
+            yield _to_ndjson_line({"type": "done"})
+        finally:
+            # Client disconnected mid-stream: don't leave the backend call running
+            if workflow_task is not None and not workflow_task.done():
+                workflow_task.cancel()
 
     return StreamingResponse(event_generator(), media_type="application/x-ndjson")
 
 
+def _read_new_log_lines(f, log_path: Path) -> List[str]:
+    """Read lines appended since the last call, rewinding if the log was truncated."""
+    lines = f.readlines()
+    # Start over if the file shrank (e.g. stop.sh --clear-logs)
+    if not lines and log_path.stat().st_size < f.tell():
+        f.seek(0)
+        lines = f.readlines()
+    return lines
+
+
+# Polling interval when watchfiles is unavailable (or its watcher failed)
+LOG_POLL_INTERVAL = 0.25
+# How often an idle watcher checks in; its first check-in confirms the watch is live
+LOG_WATCH_TIMEOUT_MS = 1000
+
+
+class _LogWatcher:
+    """
+    One watchfiles watcher per log file, shared by every client tailing it,
+    so concurrent tails hold one worker thread per file rather than one each.
+    """
+
+    def __init__(self, path: Path):
+        self.path = path
+        self._waiters: set = set()
+        self._task: Optional[asyncio.Task] = None
+        self._started = False
+
+    def subscribe(self) -> asyncio.Event:
+        """Register a client and start watching if this is the first one."""
+        event = asyncio.Event()
+        self._waiters.add(event)
+        self._ensure_running()
+        return event
+
+    def unsubscribe(self, event: asyncio.Event):
+        self._waiters.discard(event)
+        if not self._waiters and self._task is not None:
+            self._task.cancel()
+            self._task = None
+
+    async def wait(self, event: asyncio.Event):
+        """Sleep until the file changes (or the watcher restarts)."""
+        self._ensure_running()
+        await event.wait()
+        event.clear()
+
+    def _ensure_running(self):
+        if self._task is None or self._task.done():
+            self._started = False
+            self._task = asyncio.create_task(self._run())
+
+    def _notify(self):
+        for event in self._waiters:
+            event.set()
+
+    async def _run(self):
+        try:
+            # awatch only starts watching on its first iteration. Its first
+            # yield, even an empty timeout one, wakes every client to re-read
+            # anything written before the watch went live.
+            async for changes in awatch(
+                self.path, debounce=50, step=50,
+                rust_timeout=LOG_WATCH_TIMEOUT_MS, yield_on_timeout=True,
+            ):
+                if changes or not self._started:
+                    self._started = True
+                    self._notify()
+        except Exception:
+            # Rate-limit restarts to the polling interval if watching keeps failing
+            await asyncio.sleep(LOG_POLL_INTERVAL)
+        finally:
+            # Wake clients so they re-read and, via wait(), restart the watcher
+            self._notify()
+
+
+_log_watchers: Dict[Path, _LogWatcher] = {}
+
+
+def _get_log_watcher(log_path: Path) -> _LogWatcher:
+    watcher = _log_watchers.get(log_path)
+    if watcher is None:
+        watcher = _log_watchers[log_path] = _LogWatcher(log_path)
+    return watcher
+
+
 @app.get("/api/stream_logs")
 async def stream_logs(source: str = "agents", from_start: bool = False):
     """
@@ -438,45 +720,83 @@ async def stream_logs(source: str = "agents", from_start: bool = False):
       - source: 'agents' | 'workflow' (defaults to 'agents')
       - from_start: if True, stream from beginning of file, otherwise tail new lines
     """
-    logs_dir = Path(__file__).resolve().parent.parent / "logs"
-    file_map = {
-        "agents": logs_dir / "maestro_agents.log",
-        "workflow": logs_dir / "maestro_workflow.log",
-    }
-    log_path = file_map.get(source, file_map["agents"])  # default to agents
+    log_path = LOG_FILE_MAP.get(source, LOG_FILE_MAP["agents"])  # default to agents
 
     async def sse_generator():
         try:
             # Ensure file exists
             if not log_path.exists():
-                yield f"data: {json.dumps({'type': 'error', 'message': f'Log file not found: {log_path.name}'})}\n\n"
+                yield _to_sse_event({"type": "error", "message": f"Log file not found: {log_path.name}"})
                 return
 
-            with open(log_path, "r", encoding="utf-8", errors="ignore") as f:
+            # File I/O runs in worker threads so slow storage can't stall the loop.
+            # Without watchfiles, fall back to polling the file every 250ms.
+            # Subscribe before the first read so no write falls between the two.
+            watcher = _get_log_watcher(log_path) if awatch else None
+            changed = watcher.subscribe() if watcher else None
+            try:
+                f = await asyncio.to_thread(open, log_path, "r", encoding="utf-8", errors="ignore")
+            except BaseException:
+                if watcher is not None:
+                    watcher.unsubscribe(changed)
+                raise
+            try:
                 if not from_start:
-                    f.seek(0, os.SEEK_END)
+                    await asyncio.to_thread(f.seek, 0, os.SEEK_END)
 
                 while True:
-                    line = f.readline()
-                    if line:
+                    lines = await asyncio.to_thread(_read_new_log_lines, f, log_path)
+                    for line in lines:
                         payload = {"type": "log", "source": source, "line": line.rstrip("\n")}
-                        yield f"data: {json.dumps(payload, ensure_ascii=False)}\n\n"
+                        yield _to_sse_event(payload)
+                    if lines:
+                        continue
+
+                    if watcher is None:
+                        await asyncio.sleep(LOG_POLL_INTERVAL)
                     else:
-                        await asyncio.sleep(0.25)
+                        await watcher.wait(changed)
+            finally:
+                if watcher is not None:
+                    watcher.unsubscribe(changed)
+                await asyncio.to_thread(f.close)
         except Exception as e:
-            yield f"data: {json.dumps({'type': 'error', 'message': str(e)})}\n\n"
+            yield _to_sse_event({"type": "error", "message": str(e)})
 
     return StreamingResponse(sse_generator(), media_type="text/event-stream")
 
 
+def _yaml_files_etag(*parts: str, yaml_files: Dict[str, str]) -> str:
+    """Strong ETag over the given fields and YAML file contents."""
+    items = [item for pair in sorted(yaml_files.items()) for item in pair]
+    return f'"{cache_key(*parts, *items)}"'
+
+
+def _etag_matches(request: Request, etag: str) -> bool:
+    if_none_match = request.headers.get("if-none-match")
+    if not if_none_match:
+        return False
+    candidates = [tag.strip().removeprefix("W/") for tag in if_none_match.split(",")]
+    return etag in candidates or "*" in candidates
+
+
+# Short private caching so polling clients revalidate cheaply
+ETAG_CACHE_CONTROL = "private, max-age=2"
+
+
 @app.get("/api/get_yamls/{chat_id}", response_model=List[YamlFile])
-async def get_yamls(chat_id: str):
+async def get_yamls(chat_id: str, request: Request, response: Response):
     try:
         yaml_files = db.get_yaml_files(chat_id)
         if not yaml_files:
             raise HTTPException(
                 status_code=404, detail="Chat session not found or no YAML files"
             )
+        etag = _yaml_files_etag(yaml_files=yaml_files)
+        headers = {"ETag": etag, "Cache-Control": ETAG_CACHE_CONTROL}
+        if _etag_matches(request, etag):
+            return Response(status_code=304, headers=headers)
+        response.headers.update(headers)
         return [
             YamlFile(name=name, content=content) for name, content in yaml_files.items()
         ]
@@ -490,16 +810,16 @@ async def get_yamls(chat_id: str):
 async def get_chat_history():
     try:
         sessions = db.get_all_chat_sessions()
+        # One query for every session's latest message instead of one per session
+        last_messages = db.get_last_messages()
         history = []
         for session in sessions:
-            messages = db.get_messages(session["id"], limit=1)
-            last_message = messages[-1]["content"] if messages else ""
             history.append(
                 ChatHistory(
                     id=session["id"],
                     name=session["name"],
-                    created_at=datetime.fromisoformat(session["created_at"]),
-                    last_message=last_message,
+                    created_at=session["created_at"],  # pydantic parses the stored ISO string
+                    last_message=last_messages.get(session["id"], ""),
                     message_count=session["message_count"],
                 )
             )
@@ -511,20 +831,33 @@ async def get_chat_history():
 
 
 @app.get("/api/chat_session/{chat_id}", response_model=ChatSession)
-async def get_chat_session(chat_id: str):
+async def get_chat_session(chat_id: str, request: Request, response: Response):
     try:
         session = db.get_chat_session(chat_id)
         if not session:
             raise HTTPException(status_code=404, detail="Chat session not found")
 
-        messages = db.get_messages(chat_id)
         yaml_files = db.get_yaml_files(chat_id)
+        # New messages bump updated_at and message_count, so the message
+        # history only needs loading when the ETag doesn't match
+        etag = _yaml_files_etag(
+            session["name"],
+            str(session["updated_at"]),
+            str(session["message_count"]),
+            yaml_files=yaml_files,
+        )
+        headers = {"ETag": etag, "Cache-Control": ETAG_CACHE_CONTROL}
+        if _etag_matches(request, etag):
+            return Response(status_code=304, headers=headers)
+        response.headers.update(headers)
+
+        messages = db.get_messages(chat_id)
 
         return ChatSession(
             id=session["id"],
             name=session["name"],
-            created_at=datetime.fromisoformat(session["created_at"]),
-            updated_at=datetime.fromisoformat(session["updated_at"]),
+            created_at=session["created_at"],
+            updated_at=session["updated_at"],
             message_count=session["message_count"],
             messages=messages,
             yaml_files=yaml_files,
@@ -586,49 +919,67 @@ async def edit_yaml(request: EditYamlRequest):
     
     try:
         file_name = f"{request.file_type}.yaml"
-        edited_yaml = supervisor_agent.edit_yaml(
+        edited_yaml = await supervisor_agent.edit_yaml(
             yaml_content=request.yaml,
             file_to_edit=file_name,
-            instruction=request.instruction
+            instruction=request.instruction,
         )
         return {"edited_yaml": edited_yaml}
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Editing Agent failed: {e}")
 
 
+def _unescape_yaml_content(content: str) -> str:
+    """Undo the client's unicode_escape encoding without mangling non-ASCII text."""
+    # codecs.decode(str, 'unicode_escape') round-trips through UTF-8 bytes and
+    # turns "é" into "Ã©"; latin-1 + backslashreplace keeps every character intact
+    return content.encode('latin-1', 'backslashreplace').decode('unicode_escape')
+
+
+def _write_temp_yaml(content: str) -> str:
+    """Write YAML to a temporary file for the maestro CLI and return its path."""
+    with tempfile.NamedTemporaryFile(mode='w', suffix='.yaml', delete=False) as temp_file:
+        temp_file.write(content)
+        return temp_file.name
+
+
+def _remove_temp_yaml(path: str):
+    try:
+        os.unlink(path)
+    except FileNotFoundError:
+        pass
+
+
 @app.post("/api/validate_yaml", response_model=ValidateYamlResponse)
 async def validate_yaml(request: ValidateYamlRequest):
     try:
-        import codecs
-        unescaped_content = codecs.decode(request.yaml_content, 'unicode_escape')
-        with tempfile.NamedTemporaryFile(mode='w', suffix='.yaml', delete=False) as temp_file:
-            temp_file.write(unescaped_content)
-            temp_file_path = temp_file.name
+        unescaped_content = _unescape_yaml_content(request.yaml_content)
+        # `maestro validate` only takes a file path (no stdin / "-" support),
+        # so the content goes through a uniquely named temp file
+        temp_file_path = await asyncio.to_thread(_write_temp_yaml, unescaped_content)
         
         try:
-            project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
-            result = subprocess.run(
-                ['maestro', 'validate', temp_file_path],
-                capture_output=True,
-                text=True,
-                cwd=project_root
+            # Async subprocess so the CLI run doesn't block the event loop
+            proc = await asyncio.create_subprocess_exec(
+                'maestro', 'validate', temp_file_path,
+                stdout=asyncio.subprocess.PIPE,
+                stderr=asyncio.subprocess.PIPE,
+                cwd=PROJECT_ROOT,
             )
-            os.unlink(temp_file_path)
+            stdout, stderr = await proc.communicate()
             
-            if result.returncode == 0:
+            if proc.returncode == 0:
                 return ValidateYamlResponse(
                     is_valid=True,
                     message="YAML file is valid!",
                     errors=[]
                 )
             else:
-                error_output = result.stderr.strip() or result.stdout.strip()
-                import re
-                def strip_ansi_codes(text):
-                    ansi_escape = re.compile(r'\x1B(?:[@-Z\\-_]|\[[0-?]*[ -/]*[@-~])')
-                    return ansi_escape.sub('', text)
-                
-                cleaned_error_output = strip_ansi_codes(error_output)
+                error_output = (
+                    stderr.decode(errors="replace").strip()
+                    or stdout.decode(errors="replace").strip()
+                )
+                cleaned_error_output = _ANSI_ESCAPE_RE.sub('', error_output)
                 error_lines = [line for line in cleaned_error_output.split('\n') if line.strip()]
                 
                 if not error_lines:
@@ -645,20 +996,19 @@ async def validate_yaml(request: ValidateYamlRequest):
                 )
                 
         except FileNotFoundError:
-            os.unlink(temp_file_path)
             return ValidateYamlResponse(
                 is_valid=False,
                 message="Maestro CLI not found. Please ensure maestro is installed and available in PATH.",
                 errors=["Maestro CLI not found"]
             )
         except Exception as e:
-            if os.path.exists(temp_file_path):
-                os.unlink(temp_file_path)
             return ValidateYamlResponse(
                 is_valid=False,
                 message=f"Validation error: {str(e)}",
                 errors=[str(e)]
             )
+        finally:
+            await asyncio.to_thread(_remove_temp_yaml, temp_file_path)
             
     except Exception as e:
         return ValidateYamlResponse(
@@ -686,20 +1036,31 @@ class AsyncSupervisorResponse(BaseModel):
     message: str
     chat_id: str
 
+def _to_supervisor_response(result: Dict[str, Any]) -> SupervisorResponse:
+    """Wrap a successful SupervisorAgent result dict in the response model."""
+    # Fields come from SupervisorAgent, not the client, so skip validation.
+    return SupervisorResponse.model_construct(
+        intent=result["intent"],
+        confidence=result["confidence"],
+        reasoning=result["reasoning"],
+        response=result["response"],
+        yaml_files=result["yaml_files"],
+        chat_id=result["chat_id"],
+    )
+
 def store_request_result(request_id: str, result):
     """Store the result of a background request."""
     if isinstance(result, dict) and "error" not in result:
-        supervisor_result = SupervisorResponse(
-            intent=result["intent"],
-            confidence=result["confidence"],
-            reasoning=result["reasoning"],
-            response=result["response"],
-            yaml_files=result["yaml_files"],
-            chat_id=result["chat_id"],
-        )
-        request_results[request_id] = supervisor_result
+        request_results[request_id] = _to_supervisor_response(result)
+        _push_stream_event(request_id, {"type": "final", "result": result})
     else:
         request_results[request_id] = result
+        message = result.get("message", "") if isinstance(result, dict) else str(result)
+        _push_stream_event(request_id, {"type": "error", "message": message})
+
+def push_partial_result(request_id: str, yaml_files: List[Dict[str, str]]):
+    """Forward an intermediate set of YAML files to the request's WebSocket."""
+    _push_stream_event(request_id, {"type": "partial", "yaml_files": yaml_files})
 
 @app.post("/api/supervisor", response_model=SupervisorResponse)
 async def supervisor_route(request: SupervisorRequest):
@@ -710,7 +1071,7 @@ async def supervisor_route(request: SupervisorRequest):
     if not request.content or not request.content.strip():
         raise HTTPException(status_code=400, detail="Request content cannot be empty")
     
-    chat_id = request.chat_id or str(uuid.uuid4())
+    chat_id = request.chat_id or new_id()
     
     try:
         result_container = {}
@@ -719,13 +1080,13 @@ async def supervisor_route(request: SupervisorRequest):
             result_container[request_id] = result  
 
         temp_request_id = "sync_request"
-        supervisor_agent.process_request_in_background(
+        await supervisor_agent.process_request_in_background(
             temp_request_id,
             request.content,
             chat_id,
             create_status_logger,
             sync_result_callback,
-            db
+            db,
         )
         
         result = result_container.get(temp_request_id)
@@ -734,14 +1095,7 @@ async def supervisor_route(request: SupervisorRequest):
             raise HTTPException(status_code=500, detail=result["message"])
         
         if isinstance(result, dict):
-            return SupervisorResponse(
-                intent=result["intent"],
-                confidence=result["confidence"],
-                reasoning=result["reasoning"],
-                response=result["response"],
-                yaml_files=result["yaml_files"],
-                chat_id=result["chat_id"],
-            )
+            return _to_supervisor_response(result)
         
         return result
         
@@ -756,17 +1110,29 @@ async def supervisor_route_async(request: SupervisorRequest):
     Async version of supervisor endpoint that starts background processing 
     and returns immediately with a request ID for polling.
     """
-    request_id = str(uuid.uuid4())
-    chat_id = request.chat_id or str(uuid.uuid4())
+    request_id = new_id()
+    chat_id = request.chat_id or new_id()
+    supervisor_streams[request_id] = asyncio.Queue()
     # Start background processing using the supervisor agent
-    executor.submit(
-        supervisor_agent.process_request_in_background,
-        request_id, 
-        request.content, 
-        chat_id,
-        create_status_logger,
-        store_request_result,
-        db
+    task = asyncio.create_task(
+        supervisor_agent.process_request_in_background(
+            request_id, 
+            request.content, 
+            chat_id,
+            create_status_logger,
+            store_request_result,
+            db,
+            partial_callback=push_partial_result,
+        )
+    )
+    # The event loop only keeps weak references to tasks
+    background_tasks.add(task)
+    task.add_done_callback(background_tasks.discard)
+    # Don't hold the queue forever if no client ever subscribes
+    task.add_done_callback(
+        lambda _: asyncio.get_running_loop().call_later(
+            SUPERVISOR_STREAM_GRACE_SECONDS, supervisor_streams.pop, request_id, None
+        )
     )
     
     return AsyncSupervisorResponse(
@@ -788,6 +1154,33 @@ async def get_supervisor_result(request_id: str):
         return {"status": "processing", "message": "Request still in progress"}
 
 
+@app.websocket("/ws/supervisor/{request_id}")
+async def supervisor_stream(websocket: WebSocket, request_id: str):
+    """
+    Push status updates, partial YAML files and the final result of an async
+    supervisor request as they happen, instead of polling for them.
+    """
+    await websocket.accept()
+    queue = supervisor_streams.get(request_id)
+    if queue is None:
+        await websocket.send_json({"type": "error", "message": "Unknown request_id"})
+        await websocket.close()
+        return
+    try:
+        while True:
+            event = await queue.get()
+            await websocket.send_json(event)
+            if event["type"] in ("final", "error"):
+                # Delivered here, so a later poll won't need it
+                request_results.pop(request_id, None)
+                break
+        await websocket.close()
+    except WebSocketDisconnect:
+        pass
+    finally:
+        supervisor_streams.pop(request_id, None)
+
+
 @app.get("/api/status/{chat_id}")
 async def get_status_updates(chat_id: str):
     """Get status updates for a specific chat ID."""
@@ -822,7 +1215,7 @@ async def health_check():
             "status": "healthy",
             "database": "connected",
             "sessions_count": len(sessions),
-            "timestamp": datetime.now().isoformat(),
+            "timestamp": datetime.now(timezone.utc).isoformat(),
         }
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Health check failed: {str(e)}")
@@ -831,4 +1224,5 @@ async def health_check():
 if __name__ == "__main__":
     import uvicorn
 
+    logging.basicConfig(level=logging.INFO)
     uvicorn.run(app, host="0.0.0.0", port=8001)
@@ -5,13 +5,67 @@ This module contains the supervisor agent logic that classifies user intent
 and routes requests to appropriate handlers (workflow generation or YAML editing).
 """
 
-import json
+import asyncio
+import logging
 import re
 import yaml
-import requests
+import httpx
+import orjson
 from enum import Enum
-from dataclasses import dataclass
-from typing import List, Dict, Tuple
+from dataclasses import dataclass, replace
+from functools import lru_cache
+from typing import Any, List, Dict, Optional, Tuple
+
+from api.cache import ResponseCache, cache_key
+from api.circuit_breaker import get_breaker
+
+logger = logging.getLogger(__name__)
+_LOG_LEVELS = {"info": logging.INFO, "warning": logging.WARNING, "error": logging.ERROR}
+
+# Upper bound on how much model output the apiVersion regex fallback scans.
+# YAML documents start near the top of a response, so a degenerate multi-MB
+# reply cannot turn the non-greedy search into a long scan.
+MAX_YAML_SCAN_CHARS = 64 * 1024
+
+# libyaml C loader when PyYAML was built with it, else the pure-Python one
+YAML_LOADER = getattr(yaml, "CSafeLoader", yaml.SafeLoader)
+
+# Patterns used to pull YAML and agent fields out of model output
+_YAML_APIVERSION_RE = re.compile(r"apiVersion:.*?(?=\n\n|\Z)", re.DOTALL)
+_NAME_LINE_RE = re.compile(r"^name:\s*\w+", re.MULTILINE)
+# Kept as separate scans: a block description runs up to the next unindented
+# name:, so a combined alternation would swallow indented names inside it
+_NAME_RE = re.compile(r"name:\s*(\w+)")
+_DESC_RE = re.compile(r"description:\s*\|\s*\n\s*(.+?)(?=\nname:|$)", re.DOTALL)
+
+# Fixed parts of the intent classification prompt; only the user input and
+# the current YAML files vary per request
+_CLASSIFICATION_PROMPT_HEADER = (
+    "You are an intent classifier. "
+    "Determine if the user wants to GENERATE_WORKFLOW or EDIT_YAML."
+)
+_CLASSIFICATION_PROMPT_SCHEMA = """Return ONLY valid JSON (no prose, no markdown) with the following schema:
+{
+  "intent": "GENERATE_WORKFLOW" | "EDIT_YAML",
+  "confidence": number,  // 0.0 to 1.0
+  "reasoning": string
+}
+
+Example valid responses:
+{"intent":"GENERATE_WORKFLOW","confidence":0.92,"reasoning":"User is asking to create a new flow"}
+{"intent":"EDIT_YAML","confidence":0.87,"reasoning":"User wants to modify existing YAML"}"""
+
+_JSON_HEADERS = {"content-type": "application/json"}
+
+PARSE_FALLBACK_REASON = "Defaulted due to supervisor parsing error"
+
+# Module-level so they are shared by the per-request SupervisorAgent instances
+# Classifications expire so a changed classifier prompt or model is picked up
+_classification_cache = ResponseCache(maxsize=1024, ttl=300)
+AGENTS_YAML_CACHE_TTL = 3600
+_agents_yaml_cache = ResponseCache(maxsize=256, ttl=AGENTS_YAML_CACHE_TTL)
+# Classification calls currently awaiting the backend, keyed like the cache
+_classification_inflight: Dict[str, "asyncio.Future[Classification]"] = {}
 
 
 class Intent(str, Enum):
@@ -19,13 +73,78 @@ class Intent(str, Enum):
     EDIT_YAML = "EDIT_YAML"
 
 
-@dataclass
+@dataclass(frozen=True, slots=True)
 class Classification:
     intent: Intent
     confidence: float
     reasoning: str
 
 
+@lru_cache(maxsize=128)
+def _parse_agents_yaml(agents_yaml: str) -> Tuple[Tuple[str, str], ...]:
+    """Extract (name, description) pairs from agents YAML, cached on the text."""
+    agents_info: List[Tuple[str, str]] = []
+
+    try:
+        # Single pass over the multi-document stream; empty documents
+        # (e.g. a trailing ---) are skipped
+        documents = [
+            doc for doc in yaml.load_all(agents_yaml, Loader=YAML_LOADER) if doc
+        ]
+        for agent_data in documents:
+            if (
+                isinstance(agent_data, dict)
+                and isinstance(agent_data.get("metadata"), dict)
+                and "name" in agent_data["metadata"]
+            ):
+                name = agent_data["metadata"]["name"]
+                description = agent_data.get("spec", {}).get("description", "")
+                agents_info.append((name, description))
+        if not agents_info:
+            name_count = len(_NAME_LINE_RE.findall(agents_yaml))
+            if name_count > 1 or len(documents) > 1:
+                # Several names but no metadata blocks: the regex pass
+                # handles flat multi-agent listings
+                return _regex_agents_info(agents_yaml)
+            if documents and isinstance(documents[0], dict):
+                agent_data = documents[0]
+                if "name" in agent_data:
+                    agents_info.append((agent_data["name"], agent_data.get("description", "")))
+
+    except yaml.YAMLError:
+        # Drop documents parsed before the error; the regex pass covers them
+        return _regex_agents_info(agents_yaml)
+
+    return tuple(agents_info)
+
+
+def _regex_agents_info(agents_yaml: str) -> Tuple[Tuple[str, str], ...]:
+    """Pair names with descriptions when the YAML can't be read structurally."""
+    names = _NAME_RE.findall(agents_yaml)
+    descriptions = _DESC_RE.findall(agents_yaml)
+    return tuple(
+        (name, descriptions[i].strip() if i < len(descriptions) else "")
+        for i, name in enumerate(names)
+    )
+
+
+
+async def load_persisted_agents_yaml(db, key: str) -> Optional[str]:
+    """Look up agents YAML persisted for a prompt key, or None on a miss.
+
+    Shared by every agents generation path; honours MAESTRO_BUILDER_CACHE.
+    """
+    if db is None or not _agents_yaml_cache.enabled:
+        return None
+    return await asyncio.to_thread(db.get_cached_agents_yaml, key, AGENTS_YAML_CACHE_TTL)
+
+
+async def persist_agents_yaml(db, key: str, agents_yaml: str) -> None:
+    """Persist generated agents YAML for a prompt key, pruning expired rows."""
+    if db is None or not _agents_yaml_cache.enabled:
+        return
+    await asyncio.to_thread(db.set_cached_agents_yaml, key, agents_yaml, AGENTS_YAML_CACHE_TTL)
+
 class SupervisorAgent:
     """
     Supervisor agent that classifies user intent and coordinates workflow generation
@@ -37,18 +156,54 @@ class SupervisorAgent:
     WORKFLOW_GENERATION_URL = "http://localhost:8004/chat"
     EDITING_URL = "http://localhost:8001/api/edit_yaml"
     
-    def __init__(self, timeout_seconds: int = 30, logger_callback=None):
+    def __init__(
+        self,
+        timeout_seconds: int = 30,
+        logger_callback=None,
+        http_client: Optional[httpx.AsyncClient] = None,
+        db=None,
+    ):
         self.timeout_seconds = timeout_seconds
         self.logger_callback = logger_callback
+        # Shared pooled client from the app lifespan; without one, each call
+        # opens a short-lived client
+        self.http_client = http_client
+        # Optional Database that persists generated agents YAML across restarts
+        self.db = db
     
     def _log(self, message: str, level: str = "info"):
-        """Log a message using the provided callback or print to console."""
+        """Log a message using the provided callback or the module logger."""
         if self.logger_callback:
             self.logger_callback(message, level)
         else:
-            print(f"[{level.upper()}] {message}")
+            # Level-gated: nothing is written when the level is disabled
+            logger.log(_LOG_LEVELS.get(level, logging.INFO), "%s", message)
 
-    def classify_user_intent(
+    async def _post(self, url: str, payload: Dict[str, Any], timeout: float) -> httpx.Response:
+        """POST JSON to a backend service without blocking the event loop."""
+        breaker = get_breaker(url)
+        breaker.before_call()
+        content = orjson.dumps(payload)
+        try:
+            if self.http_client is not None:
+                resp = await self.http_client.post(
+                    url, content=content, headers=_JSON_HEADERS, timeout=timeout
+                )
+            else:
+                async with httpx.AsyncClient() as client:
+                    resp = await client.post(
+                        url, content=content, headers=_JSON_HEADERS, timeout=timeout
+                    )
+        except httpx.HTTPError:
+            breaker.record_failure()
+            raise
+        if resp.status_code >= 500:
+            breaker.record_failure()
+        else:
+            breaker.record_success()
+        return resp
+
+    async def classify_user_intent(
         self,
         user_input: str,
         agents_yaml_content: str = "",
@@ -70,16 +225,44 @@ class SupervisorAgent:
         """
         self._log("🔍 Starting to classify user prompt...")
         self._log(f"📝 User input: {user_input[:100]}{'...' if len(user_input) > 100 else ''}")
-        
+
+        key = cache_key(user_input, agents_yaml_content, workflow_yaml_content)
+        cached = _classification_cache.get(key)
+        if cached is not None:
+            self._log(f"♻️ Reusing cached intent: {cached.intent.value} (confidence: {cached.confidence:.2f})")
+            return cached
+
+        # Identical requests already in flight (UI double-sends, retries)
+        # share one backend call instead of each hitting the classifier
+        pending = _classification_inflight.get(key)
+        if pending is None:
+            pending = asyncio.ensure_future(
+                self._classify_uncached(key, user_input, agents_yaml_content, workflow_yaml_content)
+            )
+            _classification_inflight[key] = pending
+            pending.add_done_callback(lambda _: _classification_inflight.pop(key, None))
+        else:
+            self._log("⏳ Waiting on an identical classification already in progress...")
+        # Shielded so a cancelled caller doesn't cancel it for the others
+        return await asyncio.shield(pending)
+
+    async def _classify_uncached(
+        self,
+        key: str,
+        user_input: str,
+        agents_yaml_content: str,
+        workflow_yaml_content: str,
+    ) -> Classification:
+        """Ask the supervisor agent for a classification and cache usable results."""
         supervisor_prompt = self._build_classification_prompt(
             user_input, agents_yaml_content, workflow_yaml_content
         )
         
         try:
             self._log("🤖 Sending request to supervisor agent for intent classification...")
-            resp = requests.post(
+            resp = await self._post(
                 self.SUPERVISOR_URL,
-                json={"prompt": supervisor_prompt, "agent": "IntentClassifier"},
+                {"prompt": supervisor_prompt, "agent": "IntentClassifier"},
                 timeout=self.timeout_seconds,
             )
             
@@ -89,15 +272,19 @@ class SupervisorAgent:
                     f"Supervisor agent failed with status {resp.status_code}: {resp.text}"
                 )
 
-            supervisor_response = resp.json().get("response", "")
+            supervisor_response = orjson.loads(resp.content).get("response", "")
             classification = self._parse_classification_response(supervisor_response)
             
             self._log(f"✅ Intent classified as: {classification.intent.value} (confidence: {classification.confidence:.2f})")
             self._log(f"💭 Reasoning: {classification.reasoning}")
+
+            # Don't pin a defaulted result; a retry may get a parseable reply
+            if not classification.reasoning.startswith(PARSE_FALLBACK_REASON):
+                _classification_cache.set(key, classification)
             
             return classification
             
-        except requests.RequestException as e:
+        except httpx.HTTPError as e:
             self._log(f"❌ Failed to communicate with supervisor agent: {str(e)}", "error")
             raise Exception(f"Failed to communicate with supervisor agent: {str(e)}")
 
@@ -105,32 +292,16 @@ class SupervisorAgent:
         self, user_input: str, agents_yaml_content: str, workflow_yaml_content: str
     ) -> str:
         """Build the prompt for intent classification."""
-        return f"""You are an intent classifier. Determine if the user wants to GENERATE_WORKFLOW or EDIT_YAML.
-
-User input: {user_input}
-
-Current YAML files (if any):
-Agents YAML:
-{agents_yaml_content}
-
-Workflow YAML:
-{workflow_yaml_content}
-
-Return ONLY valid JSON (no prose, no markdown) with the following schema:
-{{
-  "intent": "GENERATE_WORKFLOW" | "EDIT_YAML",
-  "confidence": number,  // 0.0 to 1.0
-  "reasoning": string
-}}
-
-Example valid responses:
-{{"intent":"GENERATE_WORKFLOW","confidence":0.92,"reasoning":"User is asking to create a new flow"}}
-{{"intent":"EDIT_YAML","confidence":0.87,"reasoning":"User wants to modify existing YAML"}}"""
+        return (
+            f"{_CLASSIFICATION_PROMPT_HEADER}\n\nUser input: {user_input}\n\n"
+            f"Current YAML files (if any):\nAgents YAML:\n{agents_yaml_content}\n\n"
+            f"Workflow YAML:\n{workflow_yaml_content}\n\n{_CLASSIFICATION_PROMPT_SCHEMA}"
+        )
 
     def _parse_classification_response(self, supervisor_response: str) -> Classification:
         """Parse the JSON response from the supervisor agent."""
         try:
-            parsed = json.loads(supervisor_response)
+            parsed = self._load_classification_json(supervisor_response)
             raw_intent = str(parsed.get("intent", "")).upper()
             
             # Validate intent value
@@ -145,15 +316,31 @@ Example valid responses:
             
             return Classification(intent=intent, confidence=confidence, reasoning=reasoning)
             
-        except (json.JSONDecodeError, ValueError, KeyError) as e:
+        except (orjson.JSONDecodeError, ValueError, KeyError) as e:
             # Fallback to default intent if parsing fails
             return Classification(
                 intent=Intent.GENERATE_WORKFLOW,
                 confidence=0.5,
-                reasoning=f"Defaulted due to supervisor parsing error: {str(e)}",
+                reasoning=f"{PARSE_FALLBACK_REASON}: {str(e)}",
             )
 
-    def generate_agents_yaml(self, user_input: str) -> str:
+    def _load_classification_json(self, supervisor_response: str) -> Dict[str, Any]:
+        """Decode the classifier's JSON object, tolerating surrounding prose or fences."""
+        try:
+            parsed = orjson.loads(supervisor_response)
+        except orjson.JSONDecodeError:
+            # Models sometimes wrap the object in ```json fences or a sentence;
+            # retry on the outermost {...} span before giving up
+            start = supervisor_response.find("{")
+            end = supervisor_response.rfind("}")
+            if start < 0 or end <= start:
+                raise
+            parsed = orjson.loads(supervisor_response[start:end + 1])
+        if not isinstance(parsed, dict):
+            raise ValueError("Supervisor response is not a JSON object")
+        return parsed
+
+    async def generate_agents_yaml(self, user_input: str) -> str:
         """
         Generate agents YAML from user input.
         
@@ -167,12 +354,23 @@ Example valid responses:
             Exception: If agents generation fails
         """
         self._log("🏗️ Starting agents YAML generation...")
+
+        key = cache_key(user_input)
+        cached = _agents_yaml_cache.get(key)
+        if cached is None:
+            cached = await load_persisted_agents_yaml(self.db, key)
+            if cached is not None:
+                _agents_yaml_cache.set(key, cached)
+        if cached is not None:
+            self._log(f"♻️ Reusing cached agents YAML ({len(cached)} characters)")
+            return cached
+
         self._log("📡 Connecting to agents generation service (port 8003)...")
         
         try:
-            resp = requests.post(
+            resp = await self._post(
                 self.AGENTS_GENERATION_URL,
-                json={"prompt": user_input, "agent": "TaskInterpreter"},
+                {"prompt": user_input, "agent": "TaskInterpreter"},
                 timeout=120,  # Longer timeout for generation
             )
             
@@ -183,18 +381,22 @@ Example valid responses:
             self._log("✅ Agents generation completed successfully")
             self._log("🔄 Extracting YAML content from response...")
             
-            agents_output = resp.json().get("response", "")
+            agents_output = orjson.loads(resp.content).get("response", "")
             agents_yaml = self._extract_yaml_from_output(agents_output)
             
             self._log(f"📄 Generated agents YAML ({len(agents_yaml)} characters)")
+
+            if agents_yaml:
+                _agents_yaml_cache.set(key, agents_yaml)
+                await persist_agents_yaml(self.db, key, agents_yaml)
             
             return agents_yaml
             
-        except requests.RequestException as e:
+        except httpx.HTTPError as e:
             self._log(f"❌ Failed to communicate with agents generation service: {str(e)}", "error")
             raise Exception(f"Failed to communicate with agents generation service: {str(e)}")
 
-    def generate_workflow_yaml(self, workflow_prompt: str) -> str:
+    async def generate_workflow_yaml(self, workflow_prompt: str) -> str:
         """
         Generate workflow YAML from workflow prompt.
         
@@ -211,9 +413,9 @@ Example valid responses:
         self._log("📡 Connecting to workflow generation service (port 8004)...")
         
         try:
-            resp = requests.post(
+            resp = await self._post(
                 self.WORKFLOW_GENERATION_URL,
-                json={"prompt": workflow_prompt, "agent": "WorkflowYAMLBuilder"},
+                {"prompt": workflow_prompt, "agent": "WorkflowYAMLBuilder"},
                 timeout=120,  # Longer timeout for generation
             )
             
@@ -224,18 +426,18 @@ Example valid responses:
             self._log("✅ Workflow generation completed successfully")
             self._log("🔄 Extracting YAML content from response...")
             
-            workflow_output = resp.json().get("response", "")
+            workflow_output = orjson.loads(resp.content).get("response", "")
             workflow_yaml = self._extract_yaml_from_output(workflow_output)
             
             self._log(f"📄 Generated workflow YAML ({len(workflow_yaml)} characters)")
             
             return workflow_yaml
             
-        except requests.RequestException as e:
+        except httpx.HTTPError as e:
             self._log(f"❌ Failed to communicate with workflow generation service: {str(e)}", "error")
             raise Exception(f"Failed to communicate with workflow generation service: {str(e)}")
 
-    def edit_yaml(self, yaml_content: str, file_to_edit: str, instruction: str) -> str:
+    async def edit_yaml(self, yaml_content: str, file_to_edit: str, instruction: str) -> str:
         """
         Edit existing YAML content based on user instruction.
         
@@ -254,9 +456,9 @@ Example valid responses:
         self._log("📡 Connecting to editing service (port 8002)...")
         
         try:
-            resp = requests.post(
+            resp = await self._post(
                 "http://localhost:8002/chat",
-                json={
+                {
                     "prompt": f"Current YAML file (type: {file_to_edit.split('.')[0]}):\n{yaml_content}\n\nUser instruction: {instruction}\n\nPlease apply the requested edit and return only the updated YAML file."
                 },
                 timeout=self.timeout_seconds,
@@ -269,26 +471,30 @@ Example valid responses:
             self._log("✅ YAML editing completed successfully")
             self._log("🔄 Extracting edited YAML content...")
             
-            edited_output = resp.json().get("response", "")
+            edited_output = orjson.loads(resp.content).get("response", "")
             edited_yaml = self._extract_yaml_from_output(edited_output)
             
             self._log(f"📄 Edited YAML ready ({len(edited_yaml)} characters)")
             
             return edited_yaml
             
-        except requests.RequestException as e:
+        except httpx.HTTPError as e:
             self._log(f"❌ Failed to communicate with editing service: {str(e)}", "error")
             raise Exception(f"Failed to communicate with editing service: {str(e)}")
 
     def _extract_yaml_from_output(self, text: str) -> str:
         """Extract YAML content from model output."""
-        if "```yaml" in text:
-            return text.split("```yaml", 1)[-1].split("```", 1)[0].strip()
-        if "```" in text:
-            return text.split("```", 1)[-1].split("```", 1)[0].strip()
+        # Locate the fence bounds with find() and slice once, rather than
+        # chaining split() calls that copy the text around each fence
+        for fence in ("```yaml", "```"):
+            start = text.find(fence)
+            if start >= 0:
+                start += len(fence)
+                end = text.find("```", start)
+                return (text[start:end] if end >= 0 else text[start:]).strip()
         
         # Try to find YAML content starting with apiVersion
-        yaml_match = re.search(r"apiVersion:.*?(?=\n\n|\Z)", text, re.DOTALL)
+        yaml_match = _YAML_APIVERSION_RE.search(text[:MAX_YAML_SCAN_CHARS])
         return yaml_match.group(0).strip() if yaml_match else text.strip()
 
     def parse_agents_yaml_to_info(self, agents_yaml: str) -> List[Dict[str, str]]:
@@ -301,44 +507,10 @@ Example valid responses:
         Returns:
             List of dictionaries with agent name and description
         """
-        agents_info: List[Dict[str, str]] = []
-        
-        try:
-            # First try to parse as properly structured YAML with separators
-            agent_blocks = agents_yaml.split("---")
-            for block in agent_blocks:
-                if block.strip():
-                    agent_data = yaml.safe_load(block)
-                    if (
-                        agent_data
-                        and "metadata" in agent_data
-                        and "name" in agent_data["metadata"]
-                    ):
-                        name = agent_data["metadata"]["name"]
-                        description = agent_data.get("spec", {}).get("description", "")
-                        agents_info.append({"name": name, "description": description})
-            if not agents_info:
-                name_count = len(re.findall(r"^name:\s*\w+", agents_yaml, re.MULTILINE))
-                if name_count > 1:
-                    raise yaml.YAMLError("Multiple name entries detected - using regex fallback")
-                else:
-                    agent_data = yaml.safe_load(agents_yaml)
-                    if agent_data and isinstance(agent_data, dict):
-                        if "name" in agent_data:
-                            name = agent_data["name"]
-                            description = agent_data.get("description", "")
-                            agents_info.append({"name": name, "description": description})
-                        
-        except yaml.YAMLError:
-            name_matches = re.findall(r"name:\s*(\w+)", agents_yaml)
-            desc_matches = re.findall(
-                r"description:\s*\|\s*\n\s*(.+?)(?=\nname:|$)", agents_yaml, re.DOTALL
-            )
-            for i, name in enumerate(name_matches):
-                description = desc_matches[i].strip() if i < len(desc_matches) else ""
-                agents_info.append({"name": name, "description": description})
-                
-        return agents_info
+        return [
+            {"name": name, "description": description}
+            for name, description in _parse_agents_yaml(agents_yaml)
+        ]
 
     def build_workflow_prompt(self, agents_info: List[Dict[str, str]], user_input: str) -> str:
         """
@@ -357,12 +529,14 @@ Example valid responses:
         workflow_prompt += f"\nprompt: {user_input}"
         return workflow_prompt
 
-    def process_complete_workflow_generation(self, user_input: str, chat_id: str = None, db_instance=None) -> Tuple[str, str]:
+    async def process_complete_workflow_generation(self, user_input: str, chat_id: str = None, db_instance=None,
+                                                   on_agents_yaml=None) -> Tuple[str, str]:
         """
         Process complete workflow generation (both agents and workflow).
         
         Args:
             user_input: User's request
+            on_agents_yaml: Optional callable invoked with agents.yaml as soon as it is generated
             
         Returns:
             Tuple of (agents_yaml, workflow_yaml)
@@ -372,16 +546,10 @@ Example valid responses:
         """
         self._log("🚀 Starting complete workflow generation process...")
         
-        agents_yaml = self.generate_agents_yaml(user_input)
+        agents_yaml = await self.generate_agents_yaml(user_input)
         self._log("✅ agents.yaml generated!")
-        
-        # Immediately save agents.yaml to database so frontend can see it
-        if chat_id and db_instance:
-            try:
-                db_instance.update_yaml_files(chat_id, {"agents.yaml": agents_yaml})
-                self._log("💾 Saved agents.yaml to database for immediate viewing")
-            except Exception as e:
-                self._log(f"⚠️ Could not save agents.yaml immediately: {e}", "warning")
+        if on_agents_yaml:
+            on_agents_yaml(agents_yaml)
             
         self._log("🔍 Parsing generated agents for workflow creation...")
         agents_info = self.parse_agents_yaml_to_info(agents_yaml)
@@ -389,12 +557,29 @@ Example valid responses:
         
         self._log("📝 Building workflow generation prompt...")
         workflow_prompt = self.build_workflow_prompt(agents_info, user_input)
-        workflow_yaml = self.generate_workflow_yaml(workflow_prompt)
+
+        # Save agents.yaml for the frontend while the workflow is generated
+        _, workflow_yaml = await asyncio.gather(
+            self._save_agents_yaml(agents_yaml, chat_id, db_instance),
+            self.generate_workflow_yaml(workflow_prompt),
+        )
         
         self._log("🎉 Complete workflow generation finished successfully!")
         
         return agents_yaml, workflow_yaml
 
+    async def _save_agents_yaml(self, agents_yaml: str, chat_id: str, db_instance):
+        """Store agents.yaml immediately so the frontend can show it before the workflow is ready."""
+        if not (chat_id and db_instance):
+            return
+        try:
+            await asyncio.to_thread(
+                db_instance.update_yaml_files, chat_id, {"agents.yaml": agents_yaml}
+            )
+            self._log("💾 Saved agents.yaml to database for immediate viewing")
+        except Exception as e:
+            self._log(f"⚠️ Could not save agents.yaml immediately: {e}", "warning")
+
     def build_success_response(self, intent: Intent, user_request: str, file_edited: str = None) -> str:
         """
         Build success response message based on the operation performed.
@@ -419,8 +604,9 @@ Example valid responses:
             "Both files are now available in the YAML panel on the right. You can switch between tabs to view each file."
         )
 
-    def process_request_in_background(self, request_id: str, content: str, chat_id: str, 
-                                     status_logger_callback, result_callback, db_instance):
+    async def process_request_in_background(self, request_id: str, content: str, chat_id: str, 
+                                            status_logger_callback, result_callback, db_instance,
+                                            partial_callback=None):
         """
         Background function to process supervisor requests with real-time status updates.
         
@@ -431,10 +617,16 @@ Example valid responses:
             status_logger_callback: Function to call for status updates
             result_callback: Function to call with final result
             db_instance: Database instance for YAML file retrieval
+            partial_callback: Optional function called with (request_id, yaml_files)
+                when an intermediate file is ready, before the final result
         """
         try:
             status_logger = status_logger_callback(request_id)
-            logged_supervisor = SupervisorAgent(logger_callback=status_logger)
+            logged_supervisor = SupervisorAgent(
+                logger_callback=status_logger,
+                http_client=self.http_client,
+                db=db_instance,
+            )
             
             status_logger("🎯 Processing your request...")
             
@@ -445,12 +637,10 @@ Example valid responses:
             if chat_id:
                 try:
                     status_logger("📂 Loading existing YAML files for context...")
-                    yaml_files = db_instance.get_yaml_files(chat_id)
-                    for file in yaml_files:
-                        if file['name'] == 'agents.yaml':
-                            agents_yaml_content = file['content']
-                        elif file['name'] == 'workflow.yaml':
-                            workflow_yaml_content = file['content']
+                    # get_yaml_files returns a {file_name: content} map from one query
+                    yaml_files = await asyncio.to_thread(db_instance.get_yaml_files, chat_id)
+                    agents_yaml_content = yaml_files.get('agents.yaml', '')
+                    workflow_yaml_content = yaml_files.get('workflow.yaml', '')
                     if agents_yaml_content or workflow_yaml_content:
                         status_logger("✅ Found existing YAML files to use as context")
                     else:
@@ -459,7 +649,7 @@ Example valid responses:
                     status_logger(f"⚠️ Could not fetch YAML files for context: {e}", "warning")
             
             # Classify user intent
-            classification = logged_supervisor.classify_user_intent(
+            classification = await logged_supervisor.classify_user_intent(
                 content, agents_yaml_content, workflow_yaml_content
             )
 
@@ -467,14 +657,14 @@ Example valid responses:
             if classification.intent == Intent.EDIT_YAML:
                 if not agents_yaml_content and not workflow_yaml_content:
                     status_logger("⚠️ No existing YAML files found, switching to workflow generation")
-                    classification.intent = Intent.GENERATE_WORKFLOW
+                    classification = replace(classification, intent=Intent.GENERATE_WORKFLOW)
                 else:
                     file_to_edit = "agents.yaml" if agents_yaml_content else "workflow.yaml"
                     yaml_content = agents_yaml_content if agents_yaml_content else workflow_yaml_content
                     
                     status_logger(f"✏️ Editing {file_to_edit}...")
                     
-                    edited_yaml = logged_supervisor.edit_yaml(
+                    edited_yaml = await logged_supervisor.edit_yaml(
                         yaml_content=yaml_content,
                         file_to_edit=file_to_edit,
                         instruction=content,
@@ -495,14 +685,22 @@ Example valid responses:
                         "chat_id": chat_id,
                     }
                     
-                    result_callback(request_id, result)
+                    # Status first: the result closes any WebSocket subscriber
                     status_logger("🎉 Request completed successfully!")
+                    result_callback(request_id, result)
                     return
 
             # Handle GENERATE_WORKFLOW intent
             status_logger("🎯 Routing to workflow generation...")
             
-            agents_yaml, workflow_yaml = logged_supervisor.process_complete_workflow_generation(content, chat_id, db_instance)
+            on_agents_yaml = None
+            if partial_callback:
+                def on_agents_yaml(agents_yaml):
+                    partial_callback(request_id, [{"name": "agents.yaml", "content": agents_yaml}])
+
+            agents_yaml, workflow_yaml = await logged_supervisor.process_complete_workflow_generation(
+                content, chat_id, db_instance, on_agents_yaml=on_agents_yaml
+            )
             
             response_text = logged_supervisor.build_success_response(
                 Intent.GENERATE_WORKFLOW, content
@@ -520,8 +718,8 @@ Example valid responses:
                 "chat_id": chat_id,
             }
             
-            result_callback(request_id, result)
             status_logger("🎉 Request completed successfully!")
+            result_callback(request_id, result)
             
         except Exception as e:
             status_logger = status_logger_callback(request_id)
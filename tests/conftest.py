@@ -0,0 +1,116 @@
+import sys
+import os
+import codecs
+import json
+from pathlib import Path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import pytest
+from fastapi.testclient import TestClient
+
+
+def pytest_addoption(parser):
+    parser.addoption(
+        "--run-integration",
+        action="store_true",
+        default=False,
+        help="run tests that need external tools such as the maestro CLI",
+    )
+
+
+def pytest_configure(config):
+    config.addinivalue_line("markers", "integration: needs external tools; run with --run-integration")
+
+
+def pytest_collection_modifyitems(config, items):
+    if config.getoption("--run-integration"):
+        return
+    skip_integration = pytest.mark.skip(reason="needs --run-integration")
+    for item in items:
+        if "integration" in item.keywords:
+            item.add_marker(skip_integration)
+
+
+@pytest.fixture(scope="session")
+def anyio_backend():
+    """Run @pytest.mark.anyio tests on asyncio, sharing one runner for the session."""
+    return "asyncio"
+
+
+@pytest.fixture(scope="session")
+def client():
+    """One TestClient for the whole run, so app lifespan startup/shutdown happens once."""
+    from api.main import app
+    with TestClient(app) as c:
+        yield c
+
+
+@pytest.fixture
+def tmp_db(tmp_path):
+    """A Database in a temporary directory, closed on teardown."""
+    from api.database import Database
+    db = Database(str(tmp_path / "test.db"))
+    yield db
+    db.close()
+
+
+# --- Frontend sources, read once per run ---
+
+@pytest.fixture(scope="session")
+def project_root():
+    return Path(__file__).parent.parent
+
+
+def _read_project_file(project_root, relative_path):
+    path = project_root / relative_path
+    assert path.exists(), f"{path.name} not found"
+    return path.read_text()
+
+
+@pytest.fixture(scope="session")
+def yaml_panel_src(project_root):
+    return _read_project_file(project_root, "src/components/YamlPanel.tsx")
+
+
+@pytest.fixture(scope="session")
+def api_ts_src(project_root):
+    return _read_project_file(project_root, "src/services/api.ts")
+
+
+@pytest.fixture(scope="session")
+def vite_config_src(project_root):
+    return _read_project_file(project_root, "vite.config.ts")
+
+
+@pytest.fixture(scope="session")
+def package_json(project_root):
+    return json.loads(_read_project_file(project_root, "package.json"))
+
+
+@pytest.fixture(scope="session")
+def complex_agents_yaml():
+    """complex_agents.yaml as (raw, frontend-escaped) text, read once per run."""
+    raw = (Path(__file__).parent / "complex_agents.yaml").read_text()
+    return raw, codecs.encode(raw, "unicode_escape").decode("utf-8")
+
+
+# --- Supervisor backend replies, serialized once per run ---
+
+@pytest.fixture(scope="session")
+def gen_workflow_resp():
+    """Response body for a GENERATE_WORKFLOW classification."""
+    return json.dumps({"response": json.dumps({
+        "intent": "GENERATE_WORKFLOW",
+        "confidence": 0.95,
+        "reasoning": "User wants to create a new workflow",
+    })}).encode()
+
+
+@pytest.fixture(scope="session")
+def edit_yaml_resp():
+    """Response body for an EDIT_YAML classification."""
+    return json.dumps({"response": json.dumps({
+        "intent": "EDIT_YAML",
+        "confidence": 0.88,
+        "reasoning": "User wants to modify existing YAML content",
+    })}).encode()
@@ -2,23 +2,247 @@ import sys
 import os
 sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 
-from fastapi.testclient import TestClient
-from api.main import app
 import pytest
 
-client = TestClient(app)
-
 # --- API endpoint tests (do not require running server) ---
-def test_api_health():
+def test_api_health(client):
     resp = client.get("/api/health")
     assert resp.status_code == 200
     data = resp.json()
     assert data.get("status") == "healthy"
     assert "database" in data
 
-def test_api_root():
+def test_api_root(client):
     resp = client.get("/")
     assert resp.status_code == 200
     data = resp.json()
     assert "message" in data
-    assert data["message"].lower().startswith("maestro builder api") 
\ No newline at end of file
+    assert data["message"].lower().startswith("maestro builder api")
+
+def test_parse_agents_info_is_cached():
+    from api.main import _parse_agents_info
+    agents_yaml = "apiVersion: v1\nkind: Agent\nmetadata:\n  name: cached\nspec:\n  description: Cached agent\n"
+    _parse_agents_info.cache_clear()
+    assert _parse_agents_info(agents_yaml) == (("cached", "Cached agent"),)
+    assert _parse_agents_info(agents_yaml) == (("cached", "Cached agent"),)
+    assert _parse_agents_info.cache_info().hits == 1
+
+def test_parse_agents_info_multi_document():
+    from api.main import _parse_agents_info
+    agents_yaml = (
+        "apiVersion: v1\nkind: Agent\nmetadata:\n  name: first\nspec:\n  description: One\n"
+        "---\n"
+        "apiVersion: v1\nkind: Agent\nmetadata:\n  name: second\nspec:\n  description: Two\n"
+    )
+    assert _parse_agents_info(agents_yaml) == (("first", "One"), ("second", "Two"))
+
+def test_post_to_backend_retries_server_errors(monkeypatch):
+    import asyncio
+    from types import SimpleNamespace
+    from unittest.mock import AsyncMock
+    from api import main
+
+    responses = [SimpleNamespace(status_code=503), SimpleNamespace(status_code=200)]
+    post = AsyncMock(side_effect=responses)
+    monkeypatch.setattr(main.app.state, "http", SimpleNamespace(post=post), raising=False)
+    monkeypatch.setattr(main.asyncio, "sleep", AsyncMock())
+
+    resp = asyncio.run(main.post_to_backend("http://backend/chat", {"prompt": "p"}, timeout=1))
+
+    assert resp.status_code == 200
+    assert post.await_count == 2
+
+def test_extract_yaml_from_model_output():
+    from api.main import _extract_yaml_from_model_output
+    assert _extract_yaml_from_model_output("intro\n```yaml\nkind: Agent\n```\nbye") == "kind: Agent"
+    assert _extract_yaml_from_model_output("```\nkind: Agent\n```") == "kind: Agent"
+    assert _extract_yaml_from_model_output("apiVersion: v1\nkind: Agent\n\nmore text") == "apiVersion: v1\nkind: Agent"
+    assert _extract_yaml_from_model_output("no yaml here") == ""
+
+def test_simple_agents_info_matches_yaml():
+    from api.main import _parse_agents_info, SIMPLE_AGENTS_YAML, SIMPLE_AGENTS_INFO
+    parsed = [{"name": name, "description": desc} for name, desc in _parse_agents_info(SIMPLE_AGENTS_YAML)]
+    assert parsed == SIMPLE_AGENTS_INFO
+
+def test_ai_output_chunks_batches_lines():
+    import json
+    from api import main
+    output = "\n".join(f"line {i} " + "x" * 200 for i in range(200)) + "\n\n   \n"
+    chunks = list(main._ai_output_chunks(output, "agents"))
+    assert 1 < len(chunks) < 200
+    assert all(chunk.endswith(b"\n") for chunk in chunks)
+    events = [json.loads(line) for chunk in chunks for line in chunk.splitlines()]
+    assert [e["line"] for e in events] == [l for l in output.splitlines() if l.strip()]
+    assert all(e == {"type": "ai_output", "source": "agents", "line": e["line"]} for e in events)
+
+def test_generate_complete_workflow_short_circuits_edits(monkeypatch):
+    import asyncio
+    from unittest.mock import AsyncMock
+    from api import main
+    from api.supervisor import Classification, Intent
+
+    monkeypatch.setattr(main.db, "get_yaml_files", lambda chat_id: {"agents.yaml": "kind: Agent"})
+    monkeypatch.setattr(main.supervisor_agent, "classify_user_intent",
+                        AsyncMock(return_value=Classification(Intent.EDIT_YAML, 0.9, "edit request")))
+    monkeypatch.setattr(main.supervisor_agent, "edit_yaml", AsyncMock(return_value="kind: Agent\n# edited"))
+    generate_agents = AsyncMock()
+    monkeypatch.setattr(main, "generate_agents_yaml", generate_agents)
+
+    message = main.ChatMessage(content="rename the agent", chat_id="chat-1")
+    response, yaml_files, chat_id = asyncio.run(main.generate_complete_workflow(message))
+
+    assert yaml_files == [{"name": "agents.yaml", "content": "kind: Agent\n# edited"}]
+    assert chat_id == "chat-1"
+    generate_agents.assert_not_called()
+
+def test_edit_existing_yaml_skips_classification_without_yaml(monkeypatch):
+    import asyncio
+    from unittest.mock import AsyncMock
+    from api import main
+
+    monkeypatch.setattr(main.db, "get_yaml_files", lambda chat_id: {})
+    classify = AsyncMock()
+    monkeypatch.setattr(main.supervisor_agent, "classify_user_intent", classify)
+
+    message = main.ChatMessage(content="build a workflow", chat_id="chat-1")
+    assert asyncio.run(main.edit_existing_yaml(message)) is None
+    classify.assert_not_called()
+
+def test_generate_complete_workflow_falls_back_when_classifier_fails(monkeypatch):
+    import asyncio
+    from unittest.mock import AsyncMock
+    from api import main
+
+    monkeypatch.setattr(main.db, "get_yaml_files", lambda chat_id: {"agents.yaml": "kind: Agent"})
+    monkeypatch.setattr(main.supervisor_agent, "classify_user_intent",
+                        AsyncMock(side_effect=ConnectionError("connection refused")))
+    generate_agents = AsyncMock(return_value=("output", "kind: Agent"))
+    monkeypatch.setattr(main, "generate_agents_yaml", generate_agents)
+    monkeypatch.setattr(main, "generate_workflow_yaml", AsyncMock(return_value=("output", "kind: Workflow")))
+
+    message = main.ChatMessage(content="build a workflow", chat_id="chat-1")
+    response, yaml_files, chat_id = asyncio.run(main.generate_complete_workflow(message))
+
+    generate_agents.assert_awaited_once_with("build a workflow")
+    assert [f["name"] for f in yaml_files] == ["agents.yaml", "workflow.yaml"]
+
+def test_generate_agents_yaml_shares_persisted_cache(tmp_db, monkeypatch):
+    import asyncio
+    import json
+    from types import SimpleNamespace
+    from unittest.mock import AsyncMock
+    from api import main
+    from api.cache import cache_key
+    from api.supervisor import AGENTS_YAML_CACHE_TTL
+
+    monkeypatch.setattr(main, "db", tmp_db)
+    body = json.dumps({"response": "```yaml\nkind: Agent\n```"}).encode()
+    post = AsyncMock(return_value=SimpleNamespace(status_code=200, content=body, text=""))
+    monkeypatch.setattr(main, "post_to_backend", post)
+    main.agents_response_cache.clear()
+    try:
+        assert asyncio.run(main.generate_agents_yaml("persist me"))[1] == "kind: Agent"
+        assert tmp_db.get_cached_agents_yaml(cache_key("persist me"), 3600) == "kind: Agent"
+        main.agents_response_cache.clear()
+        assert asyncio.run(main.generate_agents_yaml("persist me")) == ("kind: Agent", "kind: Agent")
+        assert post.await_count == 1
+        assert main.agents_response_cache.ttl == AGENTS_YAML_CACHE_TTL
+    finally:
+        main.agents_response_cache.clear()
+
+def test_get_yamls_and_chat_session_etags(client, tmp_db, monkeypatch):
+    from api import main
+    monkeypatch.setattr(main, "db", tmp_db)
+    chat_id = tmp_db.create_chat_session(name="etag test")
+    tmp_db.update_yaml_files(chat_id, {"agents.yaml": "kind: Agent"})
+    for path in (f"/api/get_yamls/{chat_id}", f"/api/chat_session/{chat_id}"):
+        first = client.get(path)
+        assert first.status_code == 200
+        etag = first.headers["etag"]
+        assert client.get(path, headers={"If-None-Match": etag}).status_code == 304
+
+    yamls_etag = client.get(f"/api/get_yamls/{chat_id}").headers["etag"]
+    tmp_db.update_yaml_files(chat_id, {"agents.yaml": "kind: Agent\n# changed"})
+    changed = client.get(f"/api/get_yamls/{chat_id}", headers={"If-None-Match": yamls_etag})
+    assert changed.status_code == 200
+    assert changed.headers["etag"] != yamls_etag
+
+def test_new_id_returns_unique_uuid4_strings():
+    import uuid
+    from api.main import new_id
+    ids = [new_id() for _ in range(600)]
+    assert len(set(ids)) == len(ids)
+    assert all(uuid.UUID(value).version == 4 for value in ids)
+
+def test_supervisor_websocket_streams_partial_and_final(client, monkeypatch):
+    from unittest.mock import AsyncMock
+    from api import main
+    from api.supervisor import SupervisorAgent, Classification, Intent
+
+    monkeypatch.setattr(main.db, "get_yaml_files", lambda chat_id: {})
+    monkeypatch.setattr(main.db, "update_yaml_files", lambda chat_id, files: True)
+    monkeypatch.setattr(SupervisorAgent, "classify_user_intent",
+                        AsyncMock(return_value=Classification(Intent.GENERATE_WORKFLOW, 0.8, "new workflow")))
+    monkeypatch.setattr(SupervisorAgent, "generate_agents_yaml", AsyncMock(return_value="kind: Agent"))
+    monkeypatch.setattr(SupervisorAgent, "generate_workflow_yaml", AsyncMock(return_value="kind: Workflow"))
+
+    request_id = client.post("/api/supervisor-async", json={"content": "build a workflow"}).json()["request_id"]
+    with client.websocket_connect(f"/ws/supervisor/{request_id}") as ws:
+        events = []
+        while not events or events[-1]["type"] not in ("final", "error"):
+            events.append(ws.receive_json())
+
+    types = [e["type"] for e in events]
+    assert "status" in types
+    # Completion status arrives before the final event closes the socket
+    assert events[-2]["type"] == "status"
+    assert events[-2]["message"] == "🎉 Request completed successfully!"
+    partial = events[types.index("partial")]
+    assert partial["yaml_files"] == [{"name": "agents.yaml", "content": "kind: Agent"}]
+    assert types.index("partial") < types.index("final")
+    assert [f["name"] for f in events[-1]["result"]["yaml_files"]] == ["agents.yaml", "workflow.yaml"]
+    assert request_id not in main.supervisor_streams
+    assert request_id not in main.request_results
+
+def test_supervisor_websocket_unknown_request(client):
+    with client.websocket_connect("/ws/supervisor/missing") as ws:
+        assert ws.receive_json() == {"type": "error", "message": "Unknown request_id"}
+
+def test_stream_logs_shares_watcher_and_catches_early_writes(tmp_path, monkeypatch):
+    import asyncio
+    from api import main
+    if main.awatch is None:
+        pytest.skip("watchfiles not installed")
+    log = tmp_path / "agents.log"
+    log.write_text("")
+    monkeypatch.setitem(main.LOG_FILE_MAP, "agents", log)
+
+    async def scenario():
+        streams = [(await main.stream_logs(source="agents")).body_iterator for _ in range(2)]
+        pending = [asyncio.ensure_future(stream.__anext__()) for stream in streams]
+        await asyncio.sleep(0.01)
+        # Written after the first read but before the watcher has started
+        with open(log, "a") as f:
+            f.write("early\n")
+        chunks = await asyncio.wait_for(asyncio.gather(*pending), 5)
+        watcher = main._log_watchers[log]
+        waiters = len(watcher._waiters)
+        for stream in streams:
+            await stream.aclose()
+        return chunks, waiters, watcher
+
+    chunks, waiters, watcher = asyncio.run(scenario())
+    assert all(b'"line":"early"' in chunk for chunk in chunks)
+    assert waiters == 2
+    assert not watcher._waiters and watcher._task is None
+
+def test_store_request_result_handles_non_dict_errors():
+    import asyncio
+    from api import main
+    main.supervisor_streams["req-x"] = queue = asyncio.Queue()
+    try:
+        main.store_request_result("req-x", "backend exploded")
+        assert queue.get_nowait() == {"type": "error", "message": "backend exploded"}
+        assert main.request_results.pop("req-x") == "backend exploded"
+    finally:
+        main.supervisor_streams.pop("req-x", None)
@@ -0,0 +1,45 @@
+"""
+Tests for the in-process response cache.
+"""
+
+import sys
+import os
+from unittest.mock import patch
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from api.cache import ResponseCache, cache_key
+
+
+def test_cache_key_is_stable_and_separates_parts():
+    assert cache_key("a", "b") == cache_key("a", "b")
+    assert cache_key("ab", "c") != cache_key("a", "bc")
+
+
+def test_cache_evicts_least_recently_used():
+    cache = ResponseCache(maxsize=2, enabled=True)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    assert cache.get("a") == 1  # "a" is now most recently used
+    cache.set("c", 3)
+
+    assert cache.get("b") is None
+    assert cache.get("a") == 1
+    assert cache.get("c") == 3
+
+
+def test_disabled_cache_never_stores():
+    cache = ResponseCache(enabled=False)
+    cache.set("a", 1)
+    assert cache.get("a") is None
+    assert len(cache) == 0
+
+
+def test_cache_entries_expire_after_ttl():
+    cache = ResponseCache(maxsize=2, enabled=True, ttl=10)
+    with patch("api.cache.time.monotonic", return_value=100.0):
+        cache.set("a", 1)
+    with patch("api.cache.time.monotonic", return_value=109.0):
+        assert cache.get("a") == 1
+    with patch("api.cache.time.monotonic", return_value=110.0):
+        assert cache.get("a") is None
+    assert len(cache) == 0
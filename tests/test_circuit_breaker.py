@@ -0,0 +1,53 @@
+"""
+Tests for the backend circuit breaker.
+"""
+
+import sys
+import os
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from unittest.mock import patch
+
+import pytest
+
+from api.circuit_breaker import CircuitBreaker, CircuitOpenError, get_breaker, reset_breakers
+
+
+def test_breaker_opens_after_consecutive_failures():
+    breaker = CircuitBreaker("backend", fail_max=2, reset_timeout=30)
+    breaker.record_failure()
+    breaker.before_call()  # still closed after one failure
+    breaker.record_failure()
+
+    assert breaker.is_open
+    with pytest.raises(CircuitOpenError):
+        breaker.before_call()
+
+
+def test_success_resets_failure_count():
+    breaker = CircuitBreaker("backend", fail_max=2)
+    breaker.record_failure()
+    breaker.record_success()
+    breaker.record_failure()
+
+    assert not breaker.is_open
+
+
+def test_breaker_allows_trial_call_after_reset_timeout():
+    breaker = CircuitBreaker("backend", fail_max=1, reset_timeout=30)
+    with patch("api.circuit_breaker.time.monotonic", return_value=100.0):
+        breaker.record_failure()
+    with patch("api.circuit_breaker.time.monotonic", return_value=131.0):
+        breaker.before_call()  # trial call goes through
+        with pytest.raises(CircuitOpenError):
+            breaker.before_call()  # concurrent callers still fail fast
+    breaker.record_success()
+
+    assert not breaker.is_open
+
+
+def test_get_breaker_is_shared_per_backend():
+    reset_breakers()
+    assert get_breaker("http://localhost:8003/chat") is get_breaker("http://localhost:8003/other")
+    assert get_breaker("http://localhost:8003/chat") is not get_breaker("http://localhost:8004/chat")
+    reset_breakers()
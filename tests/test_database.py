@@ -0,0 +1,46 @@
+"""
+Tests for the SQLite database layer.
+"""
+
+import sys
+import os
+from concurrent.futures import ThreadPoolExecutor
+from unittest.mock import patch
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+
+def test_get_last_messages(tmp_db):
+    tmp_db.create_chat_session("chat-a")
+    tmp_db.create_chat_session("chat-b")
+    tmp_db.create_chat_session("chat-empty")
+    tmp_db.add_message("chat-a", "user", "first")
+    tmp_db.add_message("chat-a", "assistant", "latest")
+    tmp_db.add_message("chat-b", "user", "only")
+    assert tmp_db.get_last_messages() == {"chat-a": "latest", "chat-b": "only"}
+
+
+def test_shared_connection_across_threads(tmp_db):
+    tmp_db.create_chat_session("chat-a")
+    with ThreadPoolExecutor(max_workers=4) as pool:
+        list(pool.map(lambda i: tmp_db.add_message("chat-a", "user", f"m{i}"), range(20)))
+    assert len(tmp_db.get_messages("chat-a")) == 20
+    assert tmp_db.get_chat_session("chat-a")["message_count"] == 20
+
+
+def test_prompt_cache_expires(tmp_db):
+    with patch("api.database.time.time", return_value=1000.0):
+        tmp_db.set_cached_agents_yaml("hash", "kind: Agent")
+    with patch("api.database.time.time", return_value=1500.0):
+        assert tmp_db.get_cached_agents_yaml("hash", 3600) == "kind: Agent"
+        assert tmp_db.get_cached_agents_yaml("hash", 100) is None
+    assert tmp_db.get_cached_agents_yaml("missing", 3600) is None
+
+
+def test_prompt_cache_prunes_expired_rows(tmp_db):
+    with patch("api.database.time.time", return_value=1000.0):
+        tmp_db.set_cached_agents_yaml("old", "kind: Agent")
+    with patch("api.database.time.time", return_value=5000.0):
+        tmp_db.set_cached_agents_yaml("new", "kind: Agent", 3600)
+    with tmp_db._connection() as conn:
+        hashes = [row[0] for row in conn.execute("SELECT prompt_hash FROM prompt_cache")]
+    assert hashes == ["new"]
@@ -2,70 +2,87 @@
 Simple frontend tests that don't require a running server.
 """
 
+import os
+import re
+
 import pytest
-from pathlib import Path
 
 
-def test_frontend_files_exist():
+def _marker_scanner(markers):
+    """Compile one pattern that reports every marker occurrence in a single pass."""
+    # Lookahead so overlapping markers are all seen; longest first so a match
+    # at a position is the longest marker there and any shorter one is its prefix
+    alternation = "|".join(re.escape(m) for m in sorted(markers, key=len, reverse=True))
+    return re.compile(f"(?=({alternation}))")
+
+
+def _find_markers(scanner, markers, content):
+    """Return the markers present in content, stopping once all have been seen."""
+    seen = set()
+    for match in scanner.finditer(content):
+        longest = match.group(1)
+        seen.update(m for m in markers if longest.startswith(m))
+        if len(seen) == len(markers):
+            break
+    return seen
+
+
+YAML_PANEL_MARKERS = {
+    "import { useState": "Missing useState import",
+    "ValidateYamlResponse": "Missing ValidateYamlResponse import",
+    "handleValidate": "Missing validate handler",
+    "Validate": "Missing Validate button",
+}
+YAML_PANEL_SCANNER = _marker_scanner(YAML_PANEL_MARKERS)
+
+API_SERVICE_MARKERS = {
+    "validateYaml": "Missing validateYaml method",
+    "ValidateYamlResponse": "Missing ValidateYamlResponse interface",
+    "API_BASE_URL": "Missing API_BASE_URL",
+}
+API_SERVICE_SCANNER = _marker_scanner(API_SERVICE_MARKERS)
+
+
+# Essential frontend files, grouped by directory so each is listed once
+ESSENTIAL_FILES = {
+    "src": ["App.tsx", "main.tsx"],
+    "src/components": ["YamlPanel.tsx"],
+    "src/services": ["api.ts"],
+    "": ["index.html", "package.json", "vite.config.ts"],
+}
+
+
+def test_frontend_files_exist(project_root):
     """Test that essential frontend files exist."""
-    project_root = Path(__file__).parent.parent
-    
-    # Check for essential frontend files
-    essential_files = [
-        "src/App.tsx",
-        "src/main.tsx", 
-        "src/components/YamlPanel.tsx",
-        "src/services/api.ts",
-        "index.html",
-        "package.json",
-        "vite.config.ts"
-    ]
-    
-    for file_path in essential_files:
-        full_path = project_root / file_path
-        assert full_path.exists(), f"Frontend file missing: {file_path}"
+    for directory, names in ESSENTIAL_FILES.items():
+        # One directory read instead of a stat() per file
+        with os.scandir(project_root / directory) as entries:
+            existing = {entry.name for entry in entries}
+        missing = [f"{directory}/{name}".lstrip("/") for name in names if name not in existing]
+        assert not missing, f"Frontend file missing: {', '.join(missing)}"
 
 
-def test_yaml_panel_component_structure():
+def test_yaml_panel_component_structure(yaml_panel_src):
     """Test that YamlPanel component has expected structure."""
-    yaml_panel_path = Path(__file__).parent.parent / "src/components/YamlPanel.tsx"
-    
-    assert yaml_panel_path.exists(), "YamlPanel.tsx not found"
-    
-    with open(yaml_panel_path, 'r') as f:
-        content = f.read()
+    seen = _find_markers(YAML_PANEL_SCANNER, YAML_PANEL_MARKERS, yaml_panel_src)
     
     # Check for essential imports and functionality
-    assert "import { useState" in content, "Missing useState import"
-    assert "ValidateYamlResponse" in content, "Missing ValidateYamlResponse import"
-    assert "handleValidate" in content, "Missing validate handler"
-    assert "Validate" in content, "Missing Validate button"
+    missing = [message for marker, message in YAML_PANEL_MARKERS.items() if marker not in seen]
+    assert not missing, ", ".join(missing)
 
 
-def test_api_service_structure():
+def test_api_service_structure(api_ts_src):
     """Test that API service has expected structure."""
-    api_service_path = Path(__file__).parent.parent / "src/services/api.ts"
-    
-    assert api_service_path.exists(), "api.ts not found"
-    
-    with open(api_service_path, 'r') as f:
-        content = f.read()
+    seen = _find_markers(API_SERVICE_SCANNER, API_SERVICE_MARKERS, api_ts_src)
     
     # Check for essential API functionality
-    assert "validateYaml" in content, "Missing validateYaml method"
-    assert "ValidateYamlResponse" in content, "Missing ValidateYamlResponse interface"
-    assert "API_BASE_URL" in content, "Missing API_BASE_URL"
+    missing = [message for marker, message in API_SERVICE_MARKERS.items() if marker not in seen]
+    assert not missing, ", ".join(missing)
 
 
-def test_package_dependencies():
+def test_package_dependencies(package_json):
     """Test that package.json has required dependencies."""
-    package_json_path = Path(__file__).parent.parent / "package.json"
-    
-    assert package_json_path.exists(), "package.json not found"
-    
-    import json
-    with open(package_json_path, 'r') as f:
-        package_data = json.load(f)
+    package_data = package_json
     
     # Check for essential dependencies
     dependencies = package_data.get("dependencies", {})
@@ -80,14 +97,9 @@ def test_package_dependencies():
     assert "typescript" in dev_dependencies, "Missing typescript dev dependency"
 
 
-def test_vite_config():
+def test_vite_config(vite_config_src):
     """Test that Vite config exists and is valid."""
-    vite_config_path = Path(__file__).parent.parent / "vite.config.ts"
-    
-    assert vite_config_path.exists(), "vite.config.ts not found"
-    
-    with open(vite_config_path, 'r') as f:
-        content = f.read()
+    content = vite_config_src
     
     # Check for essential Vite configuration
     assert "defineConfig" in content, "Missing defineConfig"
@@ -10,20 +10,90 @@ sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')
 
 import pytest
 import json
+from collections import namedtuple
 import yaml
-from unittest.mock import Mock, patch, MagicMock
-import requests
+import asyncio
+import contextlib
+import dataclasses
+import re
+from unittest.mock import MagicMock, AsyncMock
+import httpx
 
-from api.supervisor import SupervisorAgent, Intent, Classification
+from api import supervisor as supervisor_module
+from api.circuit_breaker import reset_breakers
+from api.supervisor import SupervisorAgent, Intent, Classification, MAX_YAML_SCAN_CHARS
+
+
+@pytest.fixture(autouse=True)
+def clear_response_caches():
+    """Start every test with empty caches and closed circuit breakers."""
+    supervisor_module._classification_cache.clear()
+    supervisor_module._agents_yaml_cache.clear()
+    reset_breakers()
+
+
+# What _extract_yaml_from_output should return for each wrapping below
+EXTRACTED_AGENT_YAML = """apiVersion: v1
+kind: Agent
+metadata:
+  name: test"""
+
+
+# Stand-in for httpx.Response exposing only what SupervisorAgent reads
+FakeResp = namedtuple("FakeResp", "status_code content text", defaults=(b"", ""))
+
+
+class _StubSupervisor(SupervisorAgent):
+    """SupervisorAgent with canned generation steps; calls are recorded on spy."""
+
+    def __init__(self):
+        super().__init__()
+        self.spy = MagicMock()
+
+    async def generate_agents_yaml(self, user_input):
+        self.spy.generate_agents_yaml(user_input)
+        return "agents yaml content"
+
+    async def generate_workflow_yaml(self, workflow_prompt):
+        self.spy.generate_workflow_yaml(workflow_prompt)
+        return "workflow yaml content"
+
+    def parse_agents_yaml_to_info(self, agents_yaml):
+        self.spy.parse_agents_yaml_to_info(agents_yaml)
+        return [{"name": "agent1", "description": "desc1"}]
+
+    def build_workflow_prompt(self, agents_info, user_input):
+        self.spy.build_workflow_prompt(agents_info, user_input)
+        return "workflow prompt"
+
+
+@pytest.fixture(scope="class")
+def class_post_patch():
+    """Patch httpx.AsyncClient.post once for a whole test class.
+
+    monkeypatch itself is function-scoped, so this uses a MonkeyPatch context.
+    """
+    mock = AsyncMock()
+    with pytest.MonkeyPatch.context() as mp:
+        mp.setattr(httpx.AsyncClient, "post", mock)
+        yield mock
 
 
 class TestSupervisorAgent:
     """Test suite for SupervisorAgent class."""
     
-    def setup_method(self):
-        """Set up test fixtures."""
-        self.supervisor = SupervisorAgent(timeout_seconds=10)
-        
+    @pytest.fixture(scope="class")
+    @staticmethod
+    def supervisor():
+        """One agent per class; tests don't mutate its state."""
+        return SupervisorAgent(timeout_seconds=10)
+
+    @pytest.fixture(autouse=True)
+    def mock_post(self, class_post_patch):
+        """Stub out backend calls; tests configure return_value/side_effect."""
+        class_post_patch.reset_mock(return_value=True, side_effect=True)
+        return class_post_patch
+
     def test_supervisor_agent_initialization(self):
         """Test SupervisorAgent initialization."""
         agent = SupervisorAgent()
@@ -32,109 +102,143 @@ class TestSupervisorAgent:
         agent_custom = SupervisorAgent(timeout_seconds=60)
         assert agent_custom.timeout_seconds == 60
 
-    @patch('requests.post')
-    def test_classify_user_intent_generate_workflow(self, mock_post):
-        """Test intent classification for workflow generation."""
-        # Mock successful supervisor response
-        mock_response = Mock()
-        mock_response.status_code = 200
-        mock_response.json.return_value = {
-            "response": json.dumps({
-                "intent": "GENERATE_WORKFLOW",
-                "confidence": 0.95,
-                "reasoning": "User wants to create a new workflow"
-            })
-        }
-        mock_post.return_value = mock_response
-        
-        result = self.supervisor.classify_user_intent(
-            "Create a workflow to process customer data",
-            "",
-            ""
+    @pytest.mark.parametrize(
+        "status, reply, expected_intent, expected_confidence, reasoning_re, raises",
+        [
+            pytest.param(
+                200,
+                json.dumps({
+                    "intent": "GENERATE_WORKFLOW",
+                    "confidence": 0.95,
+                    "reasoning": "User wants to create a new workflow"
+                }),
+                Intent.GENERATE_WORKFLOW, 0.95, ".*new workflow.*", None,
+                id="generate_workflow",
+            ),
+            pytest.param(
+                200,
+                json.dumps({
+                    "intent": "EDIT_YAML",
+                    "confidence": 0.88,
+                    "reasoning": "User wants to modify existing YAML content"
+                }),
+                Intent.EDIT_YAML, 0.88, ".*modify existing.*", None,
+                id="edit_yaml",
+            ),
+            # Unparseable replies fall back to the default intent
+            pytest.param(
+                200, "This is not valid JSON",
+                Intent.GENERATE_WORKFLOW, 0.5, ".*parsing error.*", None,
+                id="invalid_json",
+            ),
+            pytest.param(
+                200, '{"intent": "INVALID_INTENT", "confidence": "not_a_number"}',
+                Intent.GENERATE_WORKFLOW, 0.5, ".*parsing error.*", None,
+                id="malformed_json",
+            ),
+            # Missing confidence and reasoning take their defaults
+            pytest.param(
+                200, '{"intent": "GENERATE_WORKFLOW"}',
+                Intent.GENERATE_WORKFLOW, 1.0, "", None,
+                id="missing_fields",
+            ),
+            pytest.param(
+                500, None,
+                None, None, None, "Supervisor agent failed with status 500",
+                id="supervisor_failure",
+            ),
+        ],
+    )
+    def test_classify_user_intent(
+        self, mock_post, supervisor, status, reply,
+        expected_intent, expected_confidence, reasoning_re, raises
+    ):
+        """Test intent classification across backend replies."""
+        mock_response = FakeResp(
+            status,
+            content=json.dumps({"response": reply}).encode(),
+            text="Internal server error",
         )
-        
-        assert isinstance(result, Classification)
-        assert result.intent == Intent.GENERATE_WORKFLOW
-        assert result.confidence == 0.95
-        assert "new workflow" in result.reasoning
-        
+        mock_post.return_value = mock_response
+
+        expectation = pytest.raises(Exception, match=raises) if raises else contextlib.nullcontext()
+        with expectation:
+            result = asyncio.run(supervisor.classify_user_intent("test input", "", ""))
+
         # Verify the request was made correctly
         mock_post.assert_called_once()
         call_args = mock_post.call_args
-        assert call_args[0][0] == self.supervisor.SUPERVISOR_URL
-        assert "agent" in call_args[1]["json"]
-        assert call_args[1]["json"]["agent"] == "IntentClassifier"
-
-    @patch('requests.post')
-    def test_classify_user_intent_edit_yaml(self, mock_post):
-        """Test intent classification for YAML editing."""
-        mock_response = Mock()
-        mock_response.status_code = 200
-        mock_response.json.return_value = {
-            "response": json.dumps({
-                "intent": "EDIT_YAML",
-                "confidence": 0.88,
-                "reasoning": "User wants to modify existing YAML content"
-            })
-        }
-        mock_post.return_value = mock_response
-        
-        result = self.supervisor.classify_user_intent(
-            "Change the timeout to 30 seconds",
-            "existing agents yaml",
-            "existing workflow yaml"
-        )
-        
-        assert result.intent == Intent.EDIT_YAML
-        assert result.confidence == 0.88
-        assert "modify existing" in result.reasoning
-
-    @patch('requests.post')
-    def test_classify_user_intent_supervisor_failure(self, mock_post):
-        """Test handling of supervisor service failure."""
-        mock_response = Mock()
-        mock_response.status_code = 500
-        mock_response.text = "Internal server error"
-        mock_post.return_value = mock_response
-        
-        with pytest.raises(Exception) as exc_info:
-            self.supervisor.classify_user_intent("test input", "", "")
-        
-        assert "Supervisor agent failed with status 500" in str(exc_info.value)
-
-    @patch('requests.post')
-    def test_classify_user_intent_invalid_json_response(self, mock_post):
-        """Test handling of invalid JSON response from supervisor."""
-        mock_response = Mock()
-        mock_response.status_code = 200
-        mock_response.json.return_value = {
-            "response": "This is not valid JSON"
-        }
+        assert call_args[0][0] == supervisor.SUPERVISOR_URL
+        payload = json.loads(call_args[1]["content"])
+        assert payload["agent"] == "IntentClassifier"
+
+        if raises:
+            return
+        assert isinstance(result, Classification)
+        assert result.intent == expected_intent
+        assert result.confidence == expected_confidence
+        assert re.fullmatch(reasoning_re, result.reasoning)
+
+    def test_classify_user_intent_uses_cache(self, mock_post, supervisor, edit_yaml_resp):
+        """Test repeated classification of identical input skips the backend."""
+        mock_response = FakeResp(200, content=edit_yaml_resp)
         mock_post.return_value = mock_response
-        
-        result = self.supervisor.classify_user_intent("test input", "", "")
-        
-        # Should fall back to default
-        assert result.intent == Intent.GENERATE_WORKFLOW
-        assert result.confidence == 0.5
-        assert "parsing error" in result.reasoning
 
-    @patch('requests.post')
-    def test_classify_user_intent_network_error(self, mock_post):
+        first = asyncio.run(supervisor.classify_user_intent("Rename the agent", "agents", ""))
+        second = asyncio.run(supervisor.classify_user_intent("Rename the agent", "agents", ""))
+
+        assert mock_post.call_count == 1
+        assert second == first
+        with pytest.raises(dataclasses.FrozenInstanceError):
+            second.intent = Intent.GENERATE_WORKFLOW
+
+    def test_classify_user_intent_coalesces_concurrent_requests(self, mock_post, supervisor, gen_workflow_resp):
+        """Test concurrent identical classifications share one backend call."""
+        mock_response = FakeResp(200, content=gen_workflow_resp)
+
+        async def slow_post(*args, **kwargs):
+            await asyncio.sleep(0.01)
+            return mock_response
+        mock_post.side_effect = slow_post
+
+        async def classify_twice():
+            return await asyncio.gather(
+                supervisor.classify_user_intent("Build a pipeline", "", ""),
+                supervisor.classify_user_intent("Build a pipeline", "", ""),
+            )
+
+        first, second = asyncio.run(classify_twice())
+
+        assert mock_post.call_count == 1
+        assert first == second
+        assert not supervisor_module._classification_inflight
+
+    def test_classify_user_intent_network_error(self, mock_post, supervisor):
         """Test handling of network errors."""
-        mock_post.side_effect = requests.RequestException("Network error")
+        mock_post.side_effect = httpx.ConnectError("Network error")
         
         with pytest.raises(Exception) as exc_info:
-            self.supervisor.classify_user_intent("test input", "", "")
+            asyncio.run(supervisor.classify_user_intent("test input", "", ""))
         
         assert "Failed to communicate with supervisor agent" in str(exc_info.value)
 
-    @patch('requests.post')
-    def test_generate_agents_yaml_success(self, mock_post):
+    def test_classify_user_intent_fails_fast_when_circuit_open(self, mock_post, supervisor):
+        """Test repeated backend failures stop further calls to that backend."""
+        mock_post.side_effect = httpx.ConnectError("Connection refused")
+
+        for i in range(5):
+            with pytest.raises(Exception):
+                asyncio.run(supervisor.classify_user_intent(f"input {i}", "", ""))
+
+        with pytest.raises(Exception) as exc_info:
+            asyncio.run(supervisor.classify_user_intent("one more", "", ""))
+
+        assert mock_post.call_count == 5
+        assert "unavailable after repeated failures" in str(exc_info.value)
+
+    def test_generate_agents_yaml_success(self, mock_post, supervisor):
         """Test successful agents YAML generation."""
-        mock_response = Mock()
-        mock_response.status_code = 200
-        mock_response.json.return_value = {
+        mock_response = FakeResp(200, content=json.dumps({
             "response": """```yaml
 apiVersion: v1
 kind: Agent
@@ -143,34 +247,58 @@ metadata:
 spec:
   description: A test agent
 ```"""
-        }
+        }).encode())
         mock_post.return_value = mock_response
         
-        result = self.supervisor.generate_agents_yaml("Create a test agent")
+        result = asyncio.run(supervisor.generate_agents_yaml("Create a test agent"))
         
         assert "apiVersion: v1" in result
         assert "name: test-agent" in result
         assert "description: A test agent" in result
 
-    @patch('requests.post')
-    def test_generate_agents_yaml_failure(self, mock_post):
+    def test_generate_agents_yaml_persists_cache(self, mock_post, tmp_db):
+        """Test generated agents YAML survives a cleared in-memory cache via the database."""
+        mock_response = FakeResp(200, content=json.dumps({
+            "response": "```yaml\nkind: Agent\nmetadata:\n  name: cached\n```"
+        }).encode())
+        mock_post.return_value = mock_response
+        supervisor = SupervisorAgent(db=tmp_db)
+
+        first = asyncio.run(supervisor.generate_agents_yaml("Create a cached agent"))
+        supervisor_module._agents_yaml_cache.clear()
+        second = asyncio.run(supervisor.generate_agents_yaml("Create a cached agent"))
+
+        assert second == first
+        assert mock_post.call_count == 1
+
+    def test_generate_agents_yaml_skips_db_cache_when_disabled(self, mock_post, tmp_db, monkeypatch):
+        """Test MAESTRO_BUILDER_CACHE=0 also bypasses the persisted prompt cache."""
+        mock_post.return_value = FakeResp(200, content=json.dumps({
+            "response": "```yaml\nkind: Agent\n```"
+        }).encode())
+        monkeypatch.setattr(supervisor_module._agents_yaml_cache, "enabled", False)
+        tmp_db.set_cached_agents_yaml(supervisor_module.cache_key("Create an agent"), "kind: Stale")
+        supervisor = SupervisorAgent(db=tmp_db)
+
+        result = asyncio.run(supervisor.generate_agents_yaml("Create an agent"))
+
+        assert result == "kind: Agent"
+        assert mock_post.call_count == 1
+        assert tmp_db.get_cached_agents_yaml(supervisor_module.cache_key("Create an agent"), 3600) == "kind: Stale"
+
+    def test_generate_agents_yaml_failure(self, mock_post, supervisor):
         """Test handling of agents generation failure."""
-        mock_response = Mock()
-        mock_response.status_code = 500
-        mock_response.text = "Generation failed"
+        mock_response = FakeResp(500, text="Generation failed")
         mock_post.return_value = mock_response
         
         with pytest.raises(Exception) as exc_info:
-            self.supervisor.generate_agents_yaml("test input")
+            asyncio.run(supervisor.generate_agents_yaml("test input"))
         
         assert "Agents generation failed" in str(exc_info.value)
 
-    @patch('requests.post')
-    def test_generate_workflow_yaml_success(self, mock_post):
+    def test_generate_workflow_yaml_success(self, mock_post, supervisor):
         """Test successful workflow YAML generation."""
-        mock_response = Mock()
-        mock_response.status_code = 200
-        mock_response.json.return_value = {
+        mock_response = FakeResp(200, content=json.dumps({
             "response": """```yaml
 apiVersion: v1
 kind: Workflow
@@ -181,21 +309,18 @@ spec:
     - name: step1
       agent: test-agent
 ```"""
-        }
+        }).encode())
         mock_post.return_value = mock_response
         
-        result = self.supervisor.generate_workflow_yaml("Create a test workflow")
+        result = asyncio.run(supervisor.generate_workflow_yaml("Create a test workflow"))
         
         assert "apiVersion: v1" in result
         assert "kind: Workflow" in result
         assert "name: test-workflow" in result
 
-    @patch('requests.post')
-    def test_edit_yaml_success(self, mock_post):
+    def test_edit_yaml_success(self, mock_post, supervisor):
         """Test successful YAML editing."""
-        mock_response = Mock()
-        mock_response.status_code = 200
-        mock_response.json.return_value = {
+        mock_response = FakeResp(200, content=json.dumps({
             "response": """```yaml
 apiVersion: v1
 kind: Agent
@@ -205,7 +330,7 @@ spec:
   description: Updated description
   timeout: 30
 ```"""
-        }
+        }).encode())
         mock_post.return_value = mock_response
         
         original_yaml = """apiVersion: v1
@@ -215,71 +340,49 @@ metadata:
 spec:
   description: Original description"""
         
-        result = self.supervisor.edit_yaml(
+        result = asyncio.run(supervisor.edit_yaml(
             original_yaml, 
             "agents.yaml", 
             "Change timeout to 30 seconds"
-        )
+        ))
         
         assert "timeout: 30" in result
         assert "Updated description" in result
 
-    def test_extract_yaml_from_output_with_yaml_markers(self):
-        """Test YAML extraction from output with yaml markers."""
-        output = """Here's the generated YAML:
+    @pytest.mark.parametrize(
+        "output",
+        [
+            pytest.param(
+                f"Here's the generated YAML:\n\n```yaml\n{EXTRACTED_AGENT_YAML}\n```\n\nThat's the result.",
+                id="yaml_markers",
+            ),
+            pytest.param(f"```\n{EXTRACTED_AGENT_YAML}\n```", id="generic_markers"),
+            pytest.param(f"{EXTRACTED_AGENT_YAML}\n\nSome additional text here.", id="without_markers"),
+        ],
+    )
+    def test_extract_yaml_from_output(self, supervisor, output):
+        """Test YAML extraction from fenced, generically fenced and bare output."""
+        assert supervisor._extract_yaml_from_output(output) == EXTRACTED_AGENT_YAML
 
-```yaml
-apiVersion: v1
-kind: Agent
-metadata:
-  name: test
-```
+    def test_extract_yaml_from_output_caps_regex_scan(self, supervisor):
+        """Test the apiVersion fallback only scans the head of oversized output."""
+        # No blank line, so an uncapped scan would run to the end of the text
+        output = "apiVersion: v1\n" + "x" * (MAX_YAML_SCAN_CHARS * 2)
 
-That's the result."""
-        
-        result = self.supervisor._extract_yaml_from_output(output)
-        expected = """apiVersion: v1
-kind: Agent
-metadata:
-  name: test"""
-        
-        assert result == expected
+        result = supervisor._extract_yaml_from_output(output)
 
-    def test_extract_yaml_from_output_with_generic_markers(self):
-        """Test YAML extraction from output with generic markers."""
-        output = """```
-apiVersion: v1
-kind: Agent
-metadata:
-  name: test
-```"""
-        
-        result = self.supervisor._extract_yaml_from_output(output)
-        expected = """apiVersion: v1
-kind: Agent
-metadata:
-  name: test"""
-        
-        assert result == expected
+        assert result.startswith("apiVersion: v1\n")
+        assert len(result) <= MAX_YAML_SCAN_CHARS
 
-    def test_extract_yaml_from_output_without_markers(self):
-        """Test YAML extraction when there are no code markers."""
-        output = """apiVersion: v1
-kind: Agent
-metadata:
-  name: test
+    def test_extract_yaml_from_output_with_unclosed_fence(self, supervisor):
+        """Test output truncated before the closing fence keeps everything after the opener."""
+        output = "Here it is:\n```yaml\napiVersion: v1\nkind: Agent\n"
 
-Some additional text here."""
-        
-        result = self.supervisor._extract_yaml_from_output(output)
-        expected = """apiVersion: v1
-kind: Agent
-metadata:
-  name: test"""
-        
-        assert result == expected
+        result = supervisor._extract_yaml_from_output(output)
+
+        assert result == "apiVersion: v1\nkind: Agent"
 
-    def test_parse_agents_yaml_to_info_valid_yaml(self):
+    def test_parse_agents_yaml_to_info_valid_yaml(self, supervisor):
         """Test parsing agents YAML to info with valid YAML."""
         agents_yaml = """apiVersion: v1
 kind: Agent
@@ -295,7 +398,7 @@ metadata:
 spec:
   description: Second agent"""
         
-        result = self.supervisor.parse_agents_yaml_to_info(agents_yaml)
+        result = supervisor.parse_agents_yaml_to_info(agents_yaml)
         
         assert len(result) == 2
         assert result[0]["name"] == "agent1"
@@ -303,7 +406,7 @@ spec:
         assert result[1]["name"] == "agent2"
         assert result[1]["description"] == "Second agent"
 
-    def test_parse_agents_yaml_to_info_invalid_yaml(self):
+    def test_parse_agents_yaml_to_info_invalid_yaml(self, supervisor):
         """Test parsing agents YAML with invalid YAML (fallback to regex)."""
         invalid_yaml = """name: agent1
 description: |
@@ -312,13 +415,68 @@ name: agent2
 description: |
   Second agent description"""
         
-        result = self.supervisor.parse_agents_yaml_to_info(invalid_yaml)
+        result = supervisor.parse_agents_yaml_to_info(invalid_yaml)
         
         assert len(result) == 2
         assert result[0]["name"] == "agent1"
         assert result[1]["name"] == "agent2"
 
-    def test_build_workflow_prompt(self):
+    def test_parse_agents_yaml_to_info_indented_names_after_block_description(self, supervisor):
+        """Test the regex fallback keeps indented names that follow a block description."""
+        agents_yaml = """name: agent1
+description: |
+  First agent
+- kind: Agent
+  metadata:
+    name: agent2
+  bad: [unclosed"""
+
+        result = supervisor.parse_agents_yaml_to_info(agents_yaml)
+
+        assert [agent["name"] for agent in result] == ["agent1", "agent2"]
+
+    def test_parse_agents_yaml_to_info_is_cached(self, supervisor):
+        """Test repeat parses of the same YAML hit the cache but return fresh lists."""
+        agents_yaml = "name: agent1\ndescription: |\n  First\nname: agent2\n"
+        supervisor_module._parse_agents_yaml.cache_clear()
+
+        first = supervisor.parse_agents_yaml_to_info(agents_yaml)
+        first.append({"name": "extra", "description": ""})
+        second = supervisor.parse_agents_yaml_to_info(agents_yaml)
+
+        assert second == [
+            {"name": "agent1", "description": "First"},
+            {"name": "agent2", "description": ""},
+        ]
+        assert supervisor_module._parse_agents_yaml.cache_info().hits == 1
+
+    def test_parse_agents_yaml_to_info_partial_parse_error(self, supervisor):
+        """Test a parse error after valid documents doesn't duplicate agents."""
+        agents_yaml = """apiVersion: v1
+kind: Agent
+metadata:
+  name: agent1
+spec:
+  description: First agent
+---
+metadata: {name: agent2"""
+
+        result = supervisor.parse_agents_yaml_to_info(agents_yaml)
+
+        assert [agent["name"] for agent in result] == ["agent1", "agent2"]
+
+    def test_build_classification_prompt(self, supervisor):
+        """Test the classification prompt embeds the inputs and JSON schema."""
+        prompt = supervisor._build_classification_prompt(
+            "Rename agent1", "agents: yaml", "workflow: yaml"
+        )
+
+        assert prompt.startswith("You are an intent classifier.")
+        assert "User input: Rename agent1\n" in prompt
+        assert "Agents YAML:\nagents: yaml\n\nWorkflow YAML:\nworkflow: yaml\n\n" in prompt
+        assert prompt.endswith('"reasoning":"User wants to modify existing YAML"}')
+
+    def test_build_workflow_prompt(self, supervisor):
         """Test building workflow prompt from agents info."""
         agents_info = [
             {"name": "agent1", "description": "First agent"},
@@ -326,46 +484,77 @@ description: |
         ]
         user_input = "Process customer data"
         
-        result = self.supervisor.build_workflow_prompt(agents_info, user_input)
+        result = supervisor.build_workflow_prompt(agents_info, user_input)
         
         assert "agent1: agent1 – First agent" in result
         assert "agent2: agent2 – Second agent" in result
         assert "prompt: Process customer data" in result
 
-    @patch.object(SupervisorAgent, 'generate_agents_yaml')
-    @patch.object(SupervisorAgent, 'generate_workflow_yaml')
-    @patch.object(SupervisorAgent, 'parse_agents_yaml_to_info')
-    @patch.object(SupervisorAgent, 'build_workflow_prompt')
-    def test_process_complete_workflow_generation(
-        self, mock_build_prompt, mock_parse_agents, 
-        mock_gen_workflow, mock_gen_agents
-    ):
+    def test_process_complete_workflow_generation(self):
         """Test complete workflow generation process."""
-        # Set up mocks
-        mock_gen_agents.return_value = "agents yaml content"
-        mock_parse_agents.return_value = [{"name": "agent1", "description": "desc1"}]
-        mock_build_prompt.return_value = "workflow prompt"
-        mock_gen_workflow.return_value = "workflow yaml content"
+        stub = _StubSupervisor()
         
-        agents_yaml, workflow_yaml = self.supervisor.process_complete_workflow_generation(
+        agents_yaml, workflow_yaml = asyncio.run(stub.process_complete_workflow_generation(
             "Create a data processing workflow"
-        )
+        ))
         
         assert agents_yaml == "agents yaml content"
         assert workflow_yaml == "workflow yaml content"
         
         # Verify the call chain
-        mock_gen_agents.assert_called_once_with("Create a data processing workflow")
-        mock_parse_agents.assert_called_once_with("agents yaml content")
-        mock_build_prompt.assert_called_once_with(
+        stub.spy.generate_agents_yaml.assert_called_once_with("Create a data processing workflow")
+        stub.spy.parse_agents_yaml_to_info.assert_called_once_with("agents yaml content")
+        stub.spy.build_workflow_prompt.assert_called_once_with(
             [{"name": "agent1", "description": "desc1"}],
             "Create a data processing workflow"
         )
-        mock_gen_workflow.assert_called_once_with("workflow prompt")
+        stub.spy.generate_workflow_yaml.assert_called_once_with("workflow prompt")
+
+    def test_process_complete_workflow_generation_saves_agents_yaml(self, supervisor, monkeypatch):
+        """Test agents.yaml is stored alongside workflow generation."""
+        monkeypatch.setattr(SupervisorAgent, "generate_agents_yaml",
+                            AsyncMock(return_value="agents yaml content"))
+        monkeypatch.setattr(SupervisorAgent, "generate_workflow_yaml",
+                            AsyncMock(return_value="workflow yaml content"))
+        db_instance = MagicMock()
+
+        agents_yaml, workflow_yaml = asyncio.run(supervisor.process_complete_workflow_generation(
+            "Create a data processing workflow", "chat-1", db_instance
+        ))
+
+        assert workflow_yaml == "workflow yaml content"
+        db_instance.update_yaml_files.assert_called_once_with(
+            "chat-1", {"agents.yaml": "agents yaml content"}
+        )
+
+    def test_process_request_in_background_uses_existing_yaml(self, supervisor, monkeypatch):
+        """Test stored YAML files are passed as context and edited."""
+        mock_classify = AsyncMock(return_value=Classification(Intent.EDIT_YAML, 0.9, "Edit request"))
+        monkeypatch.setattr(SupervisorAgent, "classify_user_intent", mock_classify)
+        monkeypatch.setattr(SupervisorAgent, "edit_yaml", AsyncMock(return_value="edited agents yaml"))
+        db_instance = MagicMock()
+        db_instance.get_yaml_files.return_value = {
+            "agents.yaml": "agents yaml",
+            "workflow.yaml": "workflow yaml",
+        }
+        results = {}
+
+        asyncio.run(supervisor.process_request_in_background(
+            "req-1", "Rename agent1", "chat-1",
+            lambda request_id: (lambda message, level="info": None),
+            results.__setitem__,
+            db_instance,
+        ))
+
+        mock_classify.assert_called_once_with("Rename agent1", "agents yaml", "workflow yaml")
+        assert results["req-1"]["intent"] == Intent.EDIT_YAML.value
+        assert results["req-1"]["yaml_files"] == [
+            {"name": "agents.yaml", "content": "edited agents yaml"}
+        ]
 
-    def test_build_success_response_generation(self):
+    def test_build_success_response_generation(self, supervisor):
         """Test building success response for generation intent."""
-        result = self.supervisor.build_success_response(
+        result = supervisor.build_success_response(
             Intent.GENERATE_WORKFLOW, 
             "Create a workflow"
         )
@@ -375,9 +564,9 @@ description: |
         assert "agents.yaml" in result
         assert "workflow.yaml" in result
 
-    def test_build_success_response_editing(self):
+    def test_build_success_response_editing(self, supervisor):
         """Test building success response for edit intent."""
-        result = self.supervisor.build_success_response(
+        result = supervisor.build_success_response(
             Intent.EDIT_YAML, 
             "Change timeout", 
             "agents.yaml"
@@ -390,52 +579,42 @@ description: |
 class TestIntentClassificationEdgeCases:
     """Test edge cases for intent classification."""
     
-    def setup_method(self):
-        self.supervisor = SupervisorAgent()
-
-    @patch('requests.post')
-    def test_malformed_json_response(self, mock_post):
-        """Test handling of malformed JSON in supervisor response."""
-        mock_response = Mock()
-        mock_response.status_code = 200
-        mock_response.json.return_value = {
-            "response": '{"intent": "INVALID_INTENT", "confidence": "not_a_number"}'
-        }
-        mock_post.return_value = mock_response
-        
-        result = self.supervisor.classify_user_intent("test", "", "")
-        
-        # Should fall back to default intent
-        assert result.intent == Intent.GENERATE_WORKFLOW
-        assert result.confidence == 0.5
+    @pytest.fixture(scope="class")
+    @staticmethod
+    def supervisor():
+        return SupervisorAgent()
+
+    @pytest.fixture(autouse=True)
+    def mock_post(self, class_post_patch):
+        """Stub out backend calls; tests configure return_value/side_effect."""
+        class_post_patch.reset_mock(return_value=True, side_effect=True)
+        return class_post_patch
+
+    def test_fenced_json_response(self, supervisor):
+        """Test a JSON object wrapped in prose and code fences is still parsed."""
+        result = supervisor._parse_classification_response(
+            'Here you go:\n```json\n{"intent": "EDIT_YAML", "confidence": 0.7, "reasoning": "Edit {agent}"}\n```'
+        )
+
+        assert result.intent == Intent.EDIT_YAML
+        assert result.confidence == 0.7
+        assert result.reasoning == "Edit {agent}"
+
+    def test_non_object_json_response(self, supervisor):
+        """Test a JSON value that isn't an object falls back to the default intent."""
+        result = supervisor._parse_classification_response('["EDIT_YAML"]')
 
-    @patch('requests.post')
-    def test_missing_fields_in_response(self, mock_post):
-        """Test handling of missing fields in supervisor JSON response."""
-        mock_response = Mock()
-        mock_response.status_code = 200
-        mock_response.json.return_value = {
-            "response": '{"intent": "GENERATE_WORKFLOW"}'  # missing confidence and reasoning
-        }
-        mock_post.return_value = mock_response
-        
-        result = self.supervisor.classify_user_intent("test", "", "")
-        
         assert result.intent == Intent.GENERATE_WORKFLOW
-        assert result.confidence == 1.0  # default value
-        assert result.reasoning == ""  # default value
+        assert result.confidence == 0.5
 
-    @patch('requests.post')
-    def test_empty_yaml_extraction(self, mock_post):
+    def test_empty_yaml_extraction(self, mock_post, supervisor):
         """Test YAML extraction when no YAML content is found."""
-        mock_response = Mock()
-        mock_response.status_code = 200
-        mock_response.json.return_value = {
+        mock_response = FakeResp(200, content=json.dumps({
             "response": "No YAML content here, just plain text."
-        }
+        }).encode())
         mock_post.return_value = mock_response
         
-        result = self.supervisor.generate_agents_yaml("test")
+        result = asyncio.run(supervisor.generate_agents_yaml("test"))
         
         # Should return the stripped text as fallback
         assert result == "No YAML content here, just plain text."
@@ -444,10 +623,12 @@ class TestIntentClassificationEdgeCases:
 class TestSupervisorIntegration:
     """Integration tests that test multiple components together."""
     
-    def setup_method(self):
-        self.supervisor = SupervisorAgent()
+    @pytest.fixture(scope="class")
+    @staticmethod
+    def supervisor():
+        return SupervisorAgent()
 
-    def test_yaml_parsing_with_real_yaml_structure(self):
+    def test_yaml_parsing_with_real_yaml_structure(self, supervisor):
         """Test YAML parsing with realistic agent definitions."""
         agents_yaml = """apiVersion: v1
 kind: Agent
@@ -467,7 +648,7 @@ spec:
     Sends notification emails to stakeholders
   framework: custom"""
         
-        result = self.supervisor.parse_agents_yaml_to_info(agents_yaml)
+        result = supervisor.parse_agents_yaml_to_info(agents_yaml)
         
         assert len(result) == 2
         assert result[0]["name"] == "DataProcessor"
@@ -475,7 +656,7 @@ spec:
         assert result[1]["name"] == "EmailSender"
         assert "notification emails" in result[1]["description"]
 
-    def test_workflow_prompt_building_realistic_scenario(self):
+    def test_workflow_prompt_building_realistic_scenario(self, supervisor):
         """Test workflow prompt building with realistic agent data."""
         agents_info = [
             {
@@ -494,7 +675,7 @@ spec:
         
         user_input = "Create a pipeline to process customer orders"
         
-        prompt = self.supervisor.build_workflow_prompt(agents_info, user_input)
+        prompt = supervisor.build_workflow_prompt(agents_info, user_input)
         
         assert "agent1: DataValidator – Validates incoming data against schema" in prompt
         assert "agent2: DataTransformer – Transforms data to required format" in prompt
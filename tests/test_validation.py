@@ -14,7 +14,11 @@ from pathlib import Path
 # Add the project root to the Python path
 sys.path.insert(0, str(Path(__file__).parent.parent))
 
+# Invalid YAML, double-escaped the way the frontend sends it
+INVALID_YAML_ESCAPED = "invalid: yaml: content:".encode('unicode_escape').decode('utf-8')
 
+
+@pytest.mark.integration
 def test_complex_agents_validation():
     """Test validation of complex multi-agent YAML file."""
     # Get the test file path
@@ -33,28 +37,21 @@ def test_complex_agents_validation():
     assert result.returncode == 0, f"Validation failed: {result.stderr or result.stdout}"
 
 
-def test_api_validation_endpoint():
+@pytest.mark.anyio
+async def test_api_validation_endpoint(complex_agents_yaml):
     """Test the API validation endpoint with the complex YAML using mocking."""
-    import asyncio
-    from unittest.mock import patch, MagicMock
-    
-    # Read the test YAML file
-    test_file = Path(__file__).parent / "complex_agents.yaml"
-    with open(test_file, 'r') as f:
-        yaml_content = f.read()
+    from unittest.mock import patch, AsyncMock, MagicMock
     
-    # Prepare the request payload (with double-escaping to simulate frontend)
-    import codecs
-    escaped_content = codecs.encode(yaml_content, 'unicode_escape').decode('utf-8')
+    # Request payload is double-escaped to simulate the frontend
+    _, escaped_content = complex_agents_yaml
     
     # Test successful validation
-    with patch('subprocess.run') as mock_run:
+    with patch('asyncio.create_subprocess_exec', new_callable=AsyncMock) as mock_exec:
         # Mock successful maestro validation
-        mock_result = MagicMock()
-        mock_result.returncode = 0
-        mock_result.stdout = "YAML file is valid."
-        mock_result.stderr = ""
-        mock_run.return_value = mock_result
+        mock_proc = MagicMock()
+        mock_proc.returncode = 0
+        mock_proc.communicate = AsyncMock(return_value=(b"YAML file is valid.", b""))
+        mock_exec.return_value = mock_proc
         
         # Import and test the API service directly
         from api.main import validate_yaml
@@ -67,31 +64,25 @@ def test_api_validation_endpoint():
         )
         
         # Test the validation function directly (async)
-        result = asyncio.run(validate_yaml(request))
+        result = await validate_yaml(request)
         
         assert result.is_valid, f"Validation failed: {result.errors}"
 
 
-def test_api_validation_error_case():
+@pytest.mark.anyio
+async def test_api_validation_error_case():
     """Test the API validation endpoint with an error case using mocking."""
-    import asyncio
-    from unittest.mock import patch, MagicMock
-    
-    # Create invalid YAML content
-    invalid_yaml = "invalid: yaml: content:"
+    from unittest.mock import patch, AsyncMock, MagicMock
     
-    # Prepare the request payload (with double-escaping to simulate frontend)
-    import codecs
-    escaped_content = codecs.encode(invalid_yaml, 'unicode_escape').decode('utf-8')
+    escaped_content = INVALID_YAML_ESCAPED
     
     # Test error validation
-    with patch('subprocess.run') as mock_run:
+    with patch('asyncio.create_subprocess_exec', new_callable=AsyncMock) as mock_exec:
         # Mock failed maestro validation
-        mock_result = MagicMock()
-        mock_result.returncode = 1
-        mock_result.stdout = ""
-        mock_result.stderr = "Error: Invalid YAML format"
-        mock_run.return_value = mock_result
+        mock_proc = MagicMock()
+        mock_proc.returncode = 1
+        mock_proc.communicate = AsyncMock(return_value=(b"", b"Error: Invalid YAML format"))
+        mock_exec.return_value = mock_proc
         
         # Import and test the API service directly
         from api.main import validate_yaml
@@ -104,12 +95,27 @@ def test_api_validation_error_case():
         )
         
         # Test the validation function directly (async)
-        result = asyncio.run(validate_yaml(request))
+        result = await validate_yaml(request)
         
         assert not result.is_valid, "Should have failed validation"
         assert result.errors, "Should have error messages"
 
 
+def test_unescape_yaml_content_preserves_non_ascii(complex_agents_yaml):
+    """Test that escaped content is decoded without mangling non-ASCII characters"""
+    import codecs
+    from api.main import _unescape_yaml_content
+
+    original = "metadata:\n  name: café-agent\n  description: 中文 agent\n"
+    escaped = codecs.encode(original, 'unicode_escape').decode('utf-8')
+
+    assert _unescape_yaml_content(escaped) == original
+    assert _unescape_yaml_content(original) == original
+
+    raw, escaped_complex = complex_agents_yaml
+    assert _unescape_yaml_content(escaped_complex) == raw
+
+
 if __name__ == "__main__":
     # For backward compatibility, can still run as script
     pytest.main([__file__]) 
\ No newline at end of file